@@ -2,15 +2,22 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from config import Config
+from app.db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    from app import db_routing, engine_profiles
+    db_routing.init_app(app)
+    engine_profiles.apply_engine_options(app)
     db.init_app(app)
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            engine_profiles.init_engine_events(app, engine, bind_key)
     migrate.init_app(app, db)
 
     # Import and register Blueprints here
@@ -20,6 +27,9 @@ def create_app(config_class=Config):
     app.register_blueprint(main_bp)
 
     # Error handling, logging, etc.
+    from app import logs, metrics
+    logs.init_app(app)
+    metrics.init_app(app)
 
     return app
 
@@ -1,11 +1,329 @@
+import atexit
+import contextvars
+import copy
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
 import openai
 from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import GenerationLease
+from app.rate_limit import get_rate_limiter
+from app.metrics import record_llm_call
+
+# Process-wide OpenAI clients keyed by API key and connection settings. Each client
+# owns a keep-alive HTTP connection pool that is reused across calls and threads.
+_client_registry = {}
+_client_registry_lock = threading.Lock()
 
 def get_openai_client():
-    """Initialize and return OpenAI client with API key from config."""
-    client = openai.OpenAI(api_key=current_app.config['OPENAI_API_KEY'])
+    """Return the shared OpenAI client for the API key and pool settings in config."""
+    config = current_app.config
+    registry_key = (
+        config['OPENAI_API_KEY'],
+        config['OPENAI_BASE_URL'],
+        config['OPENAI_TIMEOUT_SECONDS'],
+        config['OPENAI_MAX_RETRIES'],
+        config['OPENAI_MAX_CONNECTIONS'],
+        config['OPENAI_MAX_KEEPALIVE_CONNECTIONS'],
+        config['OPENAI_KEEPALIVE_EXPIRY_SECONDS'],
+    )
+    with _client_registry_lock:
+        client = _client_registry.get(registry_key)
+        if client is None:
+            client = _build_openai_client(*registry_key)
+            _client_registry[registry_key] = client
     return client
 
+def _build_openai_client(api_key, base_url, timeout, max_retries, max_connections,
+                         max_keepalive_connections, keepalive_expiry):
+    # openai 3.x sends requests through httpx2 (see requirements.txt); only the
+    # connection pool needs a custom client, timeouts and retries are SDK arguments
+    import httpx2
+    http_client = openai.DefaultHttpx2Client(
+        limits=httpx2.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+    )
+    return openai.OpenAI(
+        api_key=api_key,
+        base_url=base_url or None,
+        timeout=openai.Timeout(timeout, connect=min(timeout, 10.0)),
+        max_retries=max_retries,
+        http_client=http_client
+    )
+
+def close_openai_clients():
+    """Close all pooled OpenAI clients and their connections (called on shutdown)."""
+    with _client_registry_lock:
+        clients = list(_client_registry.values())
+        _client_registry.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            pass
+
+def _reset_client_registry_after_fork():
+    # A forked worker must not reuse sockets inherited from its parent. Drop the
+    # references without closing them (the parent still owns those connections).
+    global _client_registry_lock
+    _client_registry.clear()
+    _client_registry_lock = threading.Lock()
+
+atexit.register(close_openai_clients)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_client_registry_after_fork)
+
+def _create_chat_completion(client, expected_completion_tokens, operation, **kwargs):
+    """Send a chat completion through the shared rate limiter.
+
+    The call waits for request, token and concurrency capacity (see
+    app/rate_limit.py) and is retried with jittered backoff on 429s, timeouts
+    and server errors, honoring Retry-After. Each attempt's latency and the
+    reported token usage are recorded under `operation` (see app/metrics.py).
+    """
+    prompt_tokens = sum(len(message["content"]) for message in kwargs["messages"]) // 4 # ~4 characters per token
+
+    def timed_create(**call_kwargs):
+        started = time.perf_counter()
+        try:
+            response = client.chat.completions.create(**call_kwargs)
+        except Exception:
+            record_llm_call(operation, time.perf_counter() - started, outcome='error')
+            raise
+        # Streams report no usage; their latency is the time until the response starts
+        record_llm_call(operation, time.perf_counter() - started, usage=getattr(response, 'usage', None))
+        return response
+
+    return get_rate_limiter().call(
+        timed_create,
+        prompt_tokens + expected_completion_tokens,
+        **kwargs
+    )
+
+class _Flight:
+    """An AI call in progress in this process, shared by identical callers."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.shareable = True # False when the leader got a fallback placeholder
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+# Set while a caller that opted out with shared=False runs, so the AI calls it
+# makes through other single_flight functions are not shared either
+_unshared = contextvars.ContextVar('single_flight_unshared', default=False)
+
+def single_flight(prompt_version, is_fallback=None):
+    """Decorator that shares one outstanding AI call between identical callers.
+
+    Calls with the same function, arguments, prompt version and model that
+    overlap in time share a single upstream request: threads in this process
+    wait for the leader's result, and other processes coordinate through a
+    GenerationLease row. Only calls still in flight are shared; a call made
+    after the leader finished goes upstream again. Results must be
+    JSON-serializable.
+
+    Callers that need distinct output (e.g., filling the question bank) pass
+    shared=False to make their own call.
+
+    Args:
+        prompt_version (str): Version of the prompt the function sends
+        is_fallback (callable): is_fallback(result, *args, **kwargs) is True for
+            placeholder results, which are never shared; waiting callers make
+            their own call instead
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, shared=True, **kwargs):
+            config = current_app.config
+            if not shared:
+                token = _unshared.set(True)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    _unshared.reset(token)
+            if not config['SINGLE_FLIGHT_ENABLED'] or _unshared.get():
+                return func(*args, **kwargs)
+
+            key = generation_lease_key(func.__name__, prompt_version, args, kwargs)
+
+            with _flights_lock:
+                flight = _flights.get(key)
+                is_leader = flight is None
+                if is_leader:
+                    flight = _flights[key] = _Flight()
+
+            if not is_leader:
+                flight.done.wait()
+                if flight.error is not None:
+                    raise flight.error
+                if not flight.shareable:
+                    return func(*args, **kwargs)
+                return copy.deepcopy(flight.result)
+
+            try:
+                flight.result, flight.shareable = _call_with_lease(key, func, args, kwargs, is_fallback)
+                return copy.deepcopy(flight.result)
+            except Exception as e:
+                flight.error = e
+                raise
+            finally:
+                with _flights_lock:
+                    _flights.pop(key, None)
+                flight.done.set()
+        return wrapper
+    return decorator
+
+def generation_lease_key(name, prompt_version, args, kwargs):
+    """GenerationLease key of an AI call: function name, arguments, prompt version and model."""
+    raw_key = json.dumps([name, prompt_version, current_app.config['OPENAI_MODEL'], args, kwargs], sort_keys=True, default=str)
+    return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+def lease_holder():
+    """Identifies this process and thread as a GenerationLease holder."""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def _call_with_lease(key, func, args, kwargs, is_fallback):
+    """Runs func under a DB lease so only one process calls upstream per key.
+
+    Returns:
+        tuple: (result, shareable)
+    """
+    config = current_app.config
+    holder = lease_holder()
+    waiting = False
+    while True:
+        acquired, result, leader = acquire_lease(key, holder, waiting)
+        if acquired:
+            break
+        if result is not None:
+            current_app.logger.info(f"Single-flight: reused result of {func.__name__} from {leader}")
+            return result, True
+        waiting = True
+        time.sleep(config['SINGLE_FLIGHT_POLL_INTERVAL_SECONDS'])
+
+    try:
+        result = func(*args, **kwargs)
+    except Exception:
+        release_lease(key, holder) # Let waiting processes make the call themselves
+        raise
+    if is_fallback is not None and is_fallback(result, *args, **kwargs):
+        release_lease(key, holder) # Placeholders are not shared; waiters make their own call
+        return result, False
+    complete_lease(key, holder, result)
+    return result, True
+
+def acquire_lease(key, holder, waiting):
+    """Tries to take the lease for key.
+
+    Lease rows are read and written on their own connection so the caller's
+    session transaction is never committed or rolled back here.
+
+    Args:
+        waiting (bool): The caller already saw this lease in flight, so it may
+            take the result once the holder completes it
+
+    Returns:
+        tuple: (True, None, None) if acquired, (False, result, holder) if the
+            call the caller was waiting for finished, (False, None, None) if
+            another process is still working
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=current_app.config['SINGLE_FLIGHT_LEASE_SECONDS'])
+    table = GenerationLease.__table__
+    try:
+        with db.engine.begin() as conn:
+            # Drop completed results that waiting processes have had time to pick up
+            conn.execute(table.delete().where(table.c.completed_at.isnot(None)).where(table.c.expires_at < now))
+            row = conn.execute(table.select().where(table.c.lease_key == key)).first()
+            if row is None:
+                conn.execute(table.insert().values(lease_key=key, holder=holder, expires_at=expires_at, created_at=now))
+                return True, None, None
+            if row.completed_at is not None:
+                if waiting:
+                    return False, json.loads(row.result_json), row.holder
+                # A call that finished before this one started is not shared; start a new one
+                taken = conn.execute(table.update()
+                                     .where(table.c.lease_key == key)
+                                     .where(table.c.holder == row.holder)
+                                     .where(table.c.completed_at.isnot(None))
+                                     .values(holder=holder, expires_at=expires_at, created_at=now,
+                                             completed_at=None, result_json=None))
+                return taken.rowcount == 1, None, None
+            if row.expires_at < now:
+                # The holder died or timed out; take over with a conditional update
+                taken = conn.execute(table.update()
+                                     .where(table.c.lease_key == key)
+                                     .where(table.c.holder == row.holder)
+                                     .where(table.c.completed_at.is_(None))
+                                     .values(holder=holder, expires_at=expires_at, result_json=None))
+                return taken.rowcount == 1, None, None
+            return False, None, None
+    except IntegrityError:
+        return False, None, None # Another process inserted the lease first
+
+def complete_lease(key, holder, result):
+    table = GenerationLease.__table__
+    now = datetime.utcnow()
+    # Kept only for a few polls, for processes that were waiting on this call
+    retention = timedelta(seconds=current_app.config['SINGLE_FLIGHT_POLL_INTERVAL_SECONDS'] * 4)
+    with db.engine.begin() as conn:
+        conn.execute(table.update()
+                     .where(table.c.lease_key == key)
+                     .where(table.c.holder == holder)
+                     .values(result_json=json.dumps(result), completed_at=now, expires_at=now + retention))
+
+def set_lease_progress(key, holder, data):
+    """Publishes JSON data about a call still in flight (e.g., where its
+    output is being written) to callers waiting on the lease."""
+    table = GenerationLease.__table__
+    with db.engine.begin() as conn:
+        conn.execute(table.update()
+                     .where(table.c.lease_key == key)
+                     .where(table.c.holder == holder)
+                     .where(table.c.completed_at.is_(None))
+                     .values(result_json=json.dumps(data)))
+
+def get_lease_progress(key):
+    """Returns the data published with set_lease_progress, or None if the
+    lease is gone, completed or has published nothing."""
+    table = GenerationLease.__table__
+    with db.engine.connect() as conn:
+        row = conn.execute(table.select().where(table.c.lease_key == key)).first()
+    if row is None or row.completed_at is not None or not row.result_json:
+        return None
+    return json.loads(row.result_json)
+
+def release_lease(key, holder):
+    table = GenerationLease.__table__
+    with db.engine.begin() as conn:
+        conn.execute(table.delete().where(table.c.lease_key == key).where(table.c.holder == holder))
+
+# Bump when the classification prompt changes so cached skill lists are recomputed
+CLASSIFY_PROMPT_VERSION = 'v1'
+
+def is_fallback_classification(skills):
+    """True if the skill list is the placeholder returned when the AI response failed."""
+    return skills == _fallback_skills()
+
+def _fallback_skills():
+    return [
+        {"name": "Reading Comprehension", "category": "Reading & Writing"},
+        {"name": "Linear Equations", "category": "Math"}
+    ]
+
 def classify_missed_skills(content):
     """Analyze test results and identify missed skills.
     
@@ -36,7 +354,10 @@ def classify_missed_skills(content):
     {content}
     """
     
-    response = client.chat.completions.create(
+    response = _create_chat_completion(
+        client,
+        expected_completion_tokens=500,
+        operation='classify_missed_skills',
         model=current_app.config['OPENAI_MODEL'],
         messages=[
             {"role": "system", "content": "You are an education expert specializing in SAT test analysis."},
@@ -54,11 +375,12 @@ def classify_missed_skills(content):
     except Exception as e:
         current_app.logger.error(f"Error parsing AI response for skill classification: {e}")
         # Return a fallback list if there's an error
-        return [
-            {"name": "Reading Comprehension", "category": "Reading & Writing"},
-            {"name": "Linear Equations", "category": "Math"}
-        ]
+        return _fallback_skills()
+
+# Bump when the quiz question prompt changes so banked questions are regenerated
+QUIZ_QUESTION_PROMPT_VERSION = 'v1'
 
+@single_flight(QUIZ_QUESTION_PROMPT_VERSION, is_fallback=lambda question, *args: is_fallback_question(question))
 def generate_quiz_question(skill_name, skill_category):
     """Generate an original quiz question for a specific skill.
     
@@ -88,7 +410,10 @@ def generate_quiz_question(skill_name, skill_category):
     }}
     """
     
-    response = client.chat.completions.create(
+    response = _create_chat_completion(
+        client,
+        expected_completion_tokens=600,
+        operation='generate_quiz_question',
         model=current_app.config['OPENAI_MODEL'],
         messages=[
             {"role": "system", "content": "You are an expert SAT question creator."},
@@ -106,25 +431,63 @@ def generate_quiz_question(skill_name, skill_category):
     except Exception as e:
         current_app.logger.error(f"Error parsing AI response for question generation: {e}")
         # Return a fallback question if there's an error
-        return {
-            "question_text": f"Placeholder question for {skill_name}: Solve this example problem related to the concept.",
-            "options": {"A": "First option", "B": "Second option", "C": "Third option", "D": "Fourth option"},
-            "correct_option": "A"
-        }
+        return _fallback_question(skill_name)
 
-def generate_practice_questions(skill_name, skill_category, count=3):
+def is_fallback_question(question_data):
+    """True if the question is the placeholder returned when the AI response failed."""
+    return question_data.get("question_text", "").startswith("Placeholder question for ")
+
+def _fallback_question(skill_name):
+    return {
+        "question_text": f"Placeholder question for {skill_name}: Solve this example problem related to the concept.",
+        "options": {"A": "First option", "B": "Second option", "C": "Third option", "D": "Fourth option"},
+        "correct_option": "A"
+    }
+
+def is_valid_question(question_data):
+    """Checks that generated question data has the fields the quiz models need.
+
+    Args:
+        question_data (dict): Parsed question JSON from the AI
+
+    Returns:
+        bool: True if the question has text, A-D options and a correct option among them
+    """
+    if not isinstance(question_data, dict):
+        return False
+    question_text = question_data.get("question_text")
+    options = question_data.get("options")
+    correct_option = question_data.get("correct_option")
+    return (
+        isinstance(question_text, str) and question_text.strip() != ""
+        and isinstance(options, dict) and set(options) == {"A", "B", "C", "D"}
+        and correct_option in options
+    )
+
+@single_flight(QUIZ_QUESTION_PROMPT_VERSION,
+               is_fallback=lambda questions, *args, **kwargs: any(is_fallback_question(q) for q in questions))
+def generate_practice_questions(skill_name, skill_category, count=3, batched=True):
     """Generate multiple original practice questions for a specific skill.
     
+    In batched mode all questions are requested in a single AI call; only the
+    items that are missing or fail validation are regenerated one by one.
+    
     Args:
         skill_name (str): The name of the skill to target
         skill_category (str): The category of the skill
         count (int): Number of questions to generate (default: 3)
+        batched (bool): Request all questions in one call (default: True)
         
     Returns:
         list: List of question data dictionaries
     """
     questions = []
-    for i in range(count):
+    if batched and count > 1:
+        questions = [q for q in _generate_question_batch(skill_name, skill_category, count) if is_valid_question(q)][:count]
+        if len(questions) < count:
+            current_app.logger.warning(f"Batched generation returned {len(questions)}/{count} valid questions for {skill_name}; generating the rest individually")
+
+    for i in range(len(questions), count):
         # Use a slightly different prompt for each question to increase variety
         question = generate_quiz_question(
             f"{skill_name} (practice question {i+1} of {count})", 
@@ -133,18 +496,68 @@ def generate_practice_questions(skill_name, skill_category, count=3):
         questions.append(question)
     return questions
 
-def generate_video_script(skill_name, skill_category):
-    """Generate a script for a video lesson on a specific skill.
-    
-    Args:
-        skill_name (str): The name of the skill to teach
-        skill_category (str): The category of the skill
-        
+def _generate_question_batch(skill_name, skill_category, count):
+    """Requests `count` distinct questions in one structured JSON response.
+
     Returns:
-        str: Video script content
+        list: Raw question dictionaries (unvalidated); empty on any error
     """
     client = get_openai_client()
     
+    prompt = f"""
+    Create {count} original SAT-style questions that test a student's understanding of {skill_name} ({skill_category}).
+    
+    Important requirements:
+    1. Every question must be 100% original - NOT copied or paraphrased from any existing SAT questions
+    2. The questions must be distinct from each other: vary the context, numbers and difficulty
+    3. Each question should test the same underlying concept/skill but with unique content
+    4. Format each as a multiple-choice question with options A, B, C, and D
+    5. Clearly mark which option is correct
+    
+    Format your response as a JSON object with a "questions" list of exactly {count} items:
+    {{
+        "questions": [
+            {{
+                "question_text": "The complete question text here",
+                "options": {{"A": "First option", "B": "Second option", "C": "Third option", "D": "Fourth option"}},
+                "correct_option": "The letter of the correct answer (A, B, C, or D)"
+            }},
+            ...
+        ]
+    }}
+    """
+    
+    try:
+        response = _create_chat_completion(
+            client,
+            expected_completion_tokens=600 * count,
+            operation='generate_question_batch',
+            model=current_app.config['OPENAI_MODEL'],
+            messages=[
+                {"role": "system", "content": "You are an expert SAT question creator."},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+        result = response.choices[0].message.content
+        import json
+        questions = json.loads(result).get("questions", [])
+        return questions if isinstance(questions, list) else []
+    except Exception as e:
+        current_app.logger.error(f"Error in batched question generation for {skill_name}: {e}")
+        return []
+
+# Bump when the video script prompt changes so cached scripts are regenerated
+VIDEO_SCRIPT_PROMPT_VERSION = 'v1'
+
+def is_fallback_video_script(script, skill_name):
+    """True if the script is the placeholder returned when the AI response failed."""
+    return not script or script == _fallback_video_script(skill_name)
+
+def _fallback_video_script(skill_name):
+    return f"Placeholder video script for explaining {skill_name}. This would normally contain a full educational video script."
+
+def _video_script_messages(skill_name, skill_category):
     prompt = f"""
     Create a comprehensive script for a 5-minute educational video explaining the concept of {skill_name} ({skill_category}).
     
@@ -162,13 +575,31 @@ def generate_video_script(skill_name, skill_category):
     - Common mistakes to avoid
     - Summary and key takeaways
     """
+    return [
+        {"role": "system", "content": "You are an expert educational content creator."},
+        {"role": "user", "content": prompt}
+    ]
+
+@single_flight(VIDEO_SCRIPT_PROMPT_VERSION,
+               is_fallback=lambda script, skill_name, *args: is_fallback_video_script(script, skill_name))
+def generate_video_script(skill_name, skill_category):
+    """Generate a script for a video lesson on a specific skill.
     
-    response = client.chat.completions.create(
+    Args:
+        skill_name (str): The name of the skill to teach
+        skill_category (str): The category of the skill
+        
+    Returns:
+        str: Video script content
+    """
+    client = get_openai_client()
+    
+    response = _create_chat_completion(
+        client,
+        expected_completion_tokens=2500,
+        operation='generate_video_script',
         model=current_app.config['OPENAI_MODEL'],
-        messages=[
-            {"role": "system", "content": "You are an expert educational content creator."},
-            {"role": "user", "content": prompt}
-        ]
+        messages=_video_script_messages(skill_name, skill_category)
     )
     
     try:
@@ -178,4 +609,36 @@ def generate_video_script(skill_name, skill_category):
     except Exception as e:
         current_app.logger.error(f"Error getting AI response for video script: {e}")
         # Return a fallback script if there's an error
-        return f"Placeholder video script for explaining {skill_name}. This would normally contain a full educational video script." 
\ No newline at end of file
+        return _fallback_video_script(skill_name)
+
+def stream_video_script(skill_name, skill_category):
+    """Generate a video script, yielding text chunks as the model produces them.
+
+    Same prompt as generate_video_script. Errors (including ones mid-stream)
+    are raised rather than replaced by a fallback, since earlier chunks may
+    already have been shown to the student.
+
+    Args:
+        skill_name (str): The name of the skill to teach
+        skill_category (str): The category of the skill
+
+    Yields:
+        str: Consecutive pieces of the script
+    """
+    client = get_openai_client()
+
+    # The rate limiter holds a concurrency slot only until the response starts
+    stream = _create_chat_completion(
+        client,
+        expected_completion_tokens=2500,
+        operation='stream_video_script',
+        model=current_app.config['OPENAI_MODEL'],
+        messages=_video_script_messages(skill_name, skill_category),
+        stream=True
+    )
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
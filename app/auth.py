@@ -1,6 +1,74 @@
+import hashlib
+import threading
 from functools import wraps
-from flask import request, jsonify, g
+from flask import request, jsonify, g, current_app
+from sqlalchemy.orm import make_transient_to_detached
+from app import db
 from app.models import User
+from app.utils import TTLCache
+from app.metrics import register_collector
+
+class ApiKeyCache(TTLCache):
+    """Bounded TTL/LRU cache of API key digest -> user identity.
+
+    Only SHA-256 digests of keys are kept in memory, never the keys
+    themselves. Entries hold the user's id, username and creation time, which
+    is enough to attach a User to the session without a query.
+    """
+
+_api_key_cache = None
+_api_key_cache_lock = threading.Lock()
+
+def get_api_key_cache():
+    """Returns the process-wide API key cache, sized from config on first use."""
+    global _api_key_cache
+    if _api_key_cache is None:
+        with _api_key_cache_lock:
+            if _api_key_cache is None:
+                _api_key_cache = ApiKeyCache(
+                    max_size=current_app.config['API_KEY_CACHE_SIZE'],
+                    ttl_seconds=current_app.config['API_KEY_CACHE_TTL_SECONDS']
+                )
+    return _api_key_cache
+
+def _collect_api_key_cache_metrics():
+    if _api_key_cache is None:
+        return []
+    return [('bonsai_api_key_cache', 'gauge', "API key cache size, hits, misses and evictions",
+             [({"stat": name}, value) for name, value in _api_key_cache.stats().items()])]
+
+register_collector(_collect_api_key_cache_metrics)
+
+def api_key_digest(api_key):
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+def invalidate_api_key(api_key):
+    """Drops a key from this process's cache (called when a key is rotated).
+
+    Other processes keep a rotated key for at most API_KEY_CACHE_TTL_SECONDS.
+    """
+    if api_key and _api_key_cache is not None:
+        _api_key_cache.invalidate(api_key_digest(api_key))
+
+def _load_user(api_key):
+    """Returns the User for an API key, using the cache when possible."""
+    if current_app.config['API_KEY_CACHE_TTL_SECONDS'] <= 0:
+        return User.query.filter_by(api_key=api_key).first()
+
+    cache = get_api_key_cache()
+    digest = api_key_digest(api_key)
+    identity = cache.get(digest)
+    if identity is not None:
+        # Attach a detached User with the cached columns; no SELECT is issued.
+        # Other attributes (e.g., relationships) still load lazily on access.
+        user = User(id=identity["id"], username=identity["username"], created_at=identity["created_at"])
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = User.query.filter_by(api_key=api_key).first()
+    if user:
+        cache.set(digest, {"id": user.id, "username": user.username, "created_at": user.created_at})
+    return user
 
 def require_api_key(f):
     """Decorator to require a valid API key via Authorization: Bearer <key> header."""
@@ -16,10 +84,10 @@ def require_api_key(f):
         if not api_key:
             return jsonify({"error": "Authorization required"}), 401
 
-        user = User.query.filter_by(api_key=api_key).first()
+        user = _load_user(api_key)
         if not user:
             return jsonify({"error": "Invalid API Key"}), 401
 
         g.current_user = user # Store user in Flask's g for access in the route
         return f(*args, **kwargs)
-    return decorated_function 
\ No newline at end of file
+    return decorated_function
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import UploadClassificationCache, ClassificationCacheEntry
+from app import ai_service
+from app.jobs import register_periodic_task
+from app.utils import TTLCache
+from app.metrics import register_collector
+
+# Lookups served by this process (the per-entry hit_count columns are global)
+_stats = {
+    "upload_hits": 0, "upload_misses": 0, "upload_stores": 0, # Whole uploads, by file hash
+    "memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evictions": 0 # Classified text, by normalized digest
+}
+_stats_lock = threading.Lock()
+
+_memory_cache = None
+_memory_cache_lock = threading.Lock()
+
+def get_cached_skills(upload):
+    """Returns the skill list stored for an identical earlier upload, or None.
+
+    Entries are keyed by (content hash, practice test, prompt version, model),
+    so changing the classification prompt or model never serves stale results.
+
+    Args:
+        upload (StudentUpload): Upload with content_sha256 set
+
+    Returns:
+        list: Skill dicts ('name', 'category'), or None on a miss
+    """
+    if not current_app.config['UPLOAD_CLASSIFICATION_CACHE_ENABLED'] or not upload.content_sha256:
+        return None
+
+    entry = UploadClassificationCache.query.filter_by(
+        content_sha256=upload.content_sha256,
+        practice_test_id=upload.practice_test_id,
+        prompt_version=ai_service.CLASSIFY_PROMPT_VERSION,
+        model=current_app.config['OPENAI_MODEL']
+    ).first()
+    if entry is None:
+        _count("upload_misses")
+        return None
+
+    db.session.execute(
+        UploadClassificationCache.__table__.update().
+        where(UploadClassificationCache.id == entry.id).
+        values(hit_count=UploadClassificationCache.hit_count + 1, last_used_at=datetime.utcnow())
+    )
+    _count("upload_hits")
+    current_app.logger.info(f"Classification cache hit for upload {upload.id} (content {upload.content_sha256[:12]})")
+    return entry.skills
+
+def store_skills(upload, skills):
+    """Stores the skill list of an upload for later identical uploads.
+
+    The entry is added to the current session; it is committed together
+    with the caller's analysis results.
+    """
+    if not current_app.config['UPLOAD_CLASSIFICATION_CACHE_ENABLED'] or not upload.content_sha256:
+        return
+    try:
+        # Another worker may have stored the same upload concurrently
+        with db.session.begin_nested():
+            entry = UploadClassificationCache(
+                content_sha256=upload.content_sha256,
+                practice_test_id=upload.practice_test_id,
+                prompt_version=ai_service.CLASSIFY_PROMPT_VERSION,
+                model=current_app.config['OPENAI_MODEL'],
+                hit_count=0
+            )
+            entry.skills = skills
+            db.session.add(entry)
+        _count("upload_stores")
+    except IntegrityError:
+        pass
+
+def content_digest(content):
+    """SHA-256 of the text with case folded and whitespace collapsed."""
+    normalized = " ".join(content.casefold().split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+def classify_content(content):
+    """classify_missed_skills behind an in-process LRU and a shared DB table.
+
+    Keys are (normalized-content digest, CLASSIFY_PROMPT_VERSION, model), so
+    the same result sheet reformatted or re-cased hits the cache, and bumping
+    the prompt version or changing the model never serves stale results.
+    Entries expire after CLASSIFICATION_CACHE_TTL_SECONDS. DB rows are read
+    and written on their own connection, so this is safe to call from
+    run_concurrently worker threads.
+
+    Args:
+        content (str): Text to classify (one window of an upload)
+
+    Returns:
+        list: Skill dicts ('name', 'category')
+    """
+    config = current_app.config
+    if not config['CLASSIFICATION_CACHE_ENABLED']:
+        return ai_service.classify_missed_skills(content)
+
+    model = config['OPENAI_MODEL']
+    prompt_version = ai_service.CLASSIFY_PROMPT_VERSION
+    digest = content_digest(content)
+    cache = get_memory_cache()
+    memory_key = (digest, prompt_version, model)
+
+    skills = cache.get(memory_key)
+    if skills is not None:
+        _count("memory_hits")
+        return json.loads(skills)
+
+    table = ClassificationCacheEntry.__table__
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=config['CLASSIFICATION_CACHE_TTL_SECONDS'])
+    with db.engine.begin() as conn:
+        row = conn.execute(table.select()
+                           .where(table.c.content_digest == digest)
+                           .where(table.c.prompt_version == prompt_version)
+                           .where(table.c.model == model)
+                           .where(table.c.created_at >= cutoff)).first()
+        if row is not None:
+            conn.execute(table.update().where(table.c.id == row.id)
+                         .values(hit_count=table.c.hit_count + 1, last_used_at=now))
+    if row is not None:
+        _count("db_hits")
+        cache.set(memory_key, row.skills_json)
+        return json.loads(row.skills_json)
+
+    _count("misses")
+    skills = ai_service.classify_missed_skills(content)
+    if ai_service.is_fallback_classification(skills):
+        return skills # Never cache placeholder results
+
+    skills_json = json.dumps(skills)
+    cache.set(memory_key, skills_json)
+    try:
+        with db.engine.begin() as conn:
+            # Replace an expired row with the same key, if any
+            conn.execute(table.delete()
+                         .where(table.c.content_digest == digest)
+                         .where(table.c.prompt_version == prompt_version)
+                         .where(table.c.model == model))
+            conn.execute(table.insert().values(
+                content_digest=digest, prompt_version=prompt_version, model=model,
+                skills_json=skills_json, created_at=now, last_used_at=now, hit_count=0
+            ))
+        _count("stores")
+    except IntegrityError:
+        pass # Stored concurrently by another worker
+    return skills
+
+def evict_classification_cache():
+    """Removes expired, superseded (other prompt version or model) and least
+    recently used entries beyond CLASSIFICATION_CACHE_MAX_ENTRIES.
+
+    Returns:
+        int: Number of DB entries removed
+    """
+    config = current_app.config
+    table = ClassificationCacheEntry.__table__
+    cutoff = datetime.utcnow() - timedelta(seconds=config['CLASSIFICATION_CACHE_TTL_SECONDS'])
+    with db.engine.begin() as conn:
+        removed = conn.execute(table.delete().where(
+            (table.c.created_at < cutoff) |
+            (table.c.prompt_version != ai_service.CLASSIFY_PROMPT_VERSION) |
+            (table.c.model != config['OPENAI_MODEL'])
+        )).rowcount
+        overflow = conn.execute(select(func.count()).select_from(table)).scalar() - config['CLASSIFICATION_CACHE_MAX_ENTRIES']
+        if overflow > 0:
+            oldest = select(table.c.id).order_by(table.c.last_used_at).limit(overflow)
+            removed += conn.execute(table.delete().where(table.c.id.in_(oldest))).rowcount
+    if removed:
+        _count("evictions", removed)
+        current_app.logger.info(f"Evicted {removed} classification cache entries")
+    return removed
+
+def invalidate_classification_cache(everything=False):
+    """Drops cached classifications after a prompt or model change.
+
+    Clears this process's LRU and deletes DB entries (text and upload level)
+    made with another prompt version or model, or all of them with
+    everything=True. Other processes' LRUs expire on their own TTL; their keys
+    include the prompt version, so they never serve results across versions.
+
+    Returns:
+        int: Number of DB entries removed
+    """
+    get_memory_cache().clear()
+    config = current_app.config
+    removed = 0
+    with db.engine.begin() as conn:
+        for model in (ClassificationCacheEntry, UploadClassificationCache):
+            table = model.__table__
+            stmt = table.delete()
+            if not everything:
+                stmt = stmt.where((table.c.prompt_version != ai_service.CLASSIFY_PROMPT_VERSION) |
+                                  (table.c.model != config['OPENAI_MODEL']))
+            removed += conn.execute(stmt).rowcount
+    current_app.logger.info(f"Invalidated {removed} cached classifications")
+    return removed
+
+def get_memory_cache():
+    """Returns the process-wide LRU of classified text, sized from config on first use."""
+    global _memory_cache
+    if _memory_cache is None:
+        with _memory_cache_lock:
+            if _memory_cache is None:
+                _memory_cache = TTLCache(
+                    max_size=current_app.config['CLASSIFICATION_CACHE_MEMORY_SIZE'],
+                    ttl_seconds=current_app.config['CLASSIFICATION_CACHE_TTL_SECONDS']
+                )
+    return _memory_cache
+
+def classification_cache_stats():
+    """Returns this process's counters and hit ratios for both cache levels."""
+    with _stats_lock:
+        stats = dict(_stats)
+    upload_lookups = stats["upload_hits"] + stats["upload_misses"]
+    stats["upload_hit_ratio"] = stats["upload_hits"] / upload_lookups if upload_lookups else 0.0
+    lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+    stats["hit_ratio"] = (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+    stats["memory_size"] = get_memory_cache().stats()["size"] if _memory_cache is not None else 0
+    return stats
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def _collect_classification_cache_metrics():
+    return [('bonsai_classification_cache', 'gauge', "Classification cache lookups served by this process (see classification_cache_stats)",
+             [({"stat": name}, value) for name, value in classification_cache_stats().items()])]
+
+register_periodic_task('evict_classification_cache', evict_classification_cache, 'CLASSIFICATION_CACHE_EVICT_INTERVAL_SECONDS')
+register_collector(_collect_classification_cache_metrics)
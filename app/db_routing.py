@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect, update
+from sqlalchemy.exc import DBAPIError
+from werkzeug.exceptions import NotFound
+from app.metrics import Counter
+
+# Bind key of the read replica engine (SQLALCHEMY_BINDS), set from DATABASE_REPLICA_URL
+REPLICA_BIND = 'replica'
+
+READ_ROUTING = Counter(
+    'bonsai_db_read_routing_total', "Requests to replica-routed endpoints, by the database that answered and why",
+    ('endpoint', 'target')
+)
+
+class RoutingSession(Session):
+    """Session that sends SELECTs to the replica bind inside @read_replica views.
+
+    Everything else (flushes, INSERT/UPDATE/DELETE, and all queries outside
+    those views) uses the primary as before.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and clause is not None and getattr(clause, 'is_select', False) \
+                and has_app_context() and g.get('db_read_replica'):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def init_app(app):
+    """Adds the replica bind from DATABASE_REPLICA_URL (call before db.init_app)."""
+    url = app.config['DATABASE_REPLICA_URL']
+    if url:
+        app.config['SQLALCHEMY_BINDS'] = {**app.config.get('SQLALCHEMY_BINDS', {}), REPLICA_BIND: url}
+
+def read_replica(view):
+    """Runs a read-only view against the read replica, when one is configured.
+
+    Goes after @require_api_key. Users who committed a write within
+    DB_REPLICA_STICKY_SECONDS (user.last_write_at on the primary, so in any
+    process) read from the primary instead, so they see their own changes.
+    If the replica does not have the row yet (404, e.g. a quiz a worker just
+    created) or cannot be reached, the view is run again on the primary, so
+    must not write.
+    """
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        endpoint = request.endpoint or view.__name__
+        db = current_app.extensions['sqlalchemy']
+        if REPLICA_BIND not in db.engines:
+            return view(*args, **kwargs)
+        if _wrote_recently(db, _user_id(g.current_user)):
+            READ_ROUTING.inc(endpoint=endpoint, target='primary_sticky')
+            return view(*args, **kwargs)
+
+        g.db_read_replica = True
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 404:
+                READ_ROUTING.inc(endpoint=endpoint, target='replica')
+                return response
+        except NotFound:
+            pass
+        except DBAPIError as e:
+            current_app.logger.warning("Replica read for %s failed, using the primary: %s", endpoint, e)
+        finally:
+            g.db_read_replica = False
+
+        db.session.rollback() # Drops the replica connection and anything loaded from it
+        READ_ROUTING.inc(endpoint=endpoint, target='primary_fallback')
+        return view(*args, **kwargs)
+    return decorated_function
+
+def _wrote_recently(db, user_id):
+    from app.models import User # app.models needs app.db, which is created after this module is imported
+    seconds = current_app.config['DB_REPLICA_STICKY_SECONDS']
+    if seconds <= 0:
+        return False
+    last_write_at = db.session.query(User.last_write_at).filter(User.id == user_id).scalar() # Primary: not in a replica read yet
+    return last_write_at is not None and last_write_at > datetime.utcnow() - timedelta(seconds=seconds)
+
+def _user_id(user):
+    # From the identity key: attributes are expired after a commit, and loading them here would query
+    return inspect(user).identity[0]
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _note_flush(session, flush_context):
+    session.info['db_wrote'] = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _note_dml(orm_execute_state):
+    # Statement-level writes (e.g., apply_progress_transitions) bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['db_wrote'] = True
+
+@event.listens_for(RoutingSession, 'before_commit')
+def _stick_to_primary(session):
+    # Commits the user's last_write_at with the write itself, so every process sees it.
+    # Pending ORM changes are only flushed after this event, hence the session.new/dirty/deleted check.
+    if not (session.info.get('db_wrote') or session.new or session.dirty or session.deleted):
+        return
+    if not has_request_context() or g.get('current_user') is None:
+        return
+    if current_app.config['DB_REPLICA_STICKY_SECONDS'] <= 0 or REPLICA_BIND not in session._db.engines:
+        return
+    from app.models import User # See _wrote_recently
+    session.execute(update(User).where(User.id == _user_id(g.current_user)).values(last_write_at=datetime.utcnow()))
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_writes(session):
+    session.info.pop('db_wrote', None)
@@ -0,0 +1,69 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from app.db_routing import REPLICA_BIND
+
+# URL dialect -> profile used when DB_ENGINE_PROFILE is 'auto'
+_DIALECT_PROFILES = {'sqlite': 'sqlite', 'postgresql': 'postgresql'}
+# PRAGMAs that change the database file itself; not sent to the replica, which is only read
+_PERSISTENT_PRAGMAS = {'journal_mode'}
+
+def resolve_engine_profile(config, name=None, url=None):
+    """Returns the name of the DB_ENGINE_PROFILES entry for a database.
+
+    Args:
+        config: The app config
+        name (str): Profile setting to resolve; defaults to DB_ENGINE_PROFILE
+        url (str): Database the profile is for; defaults to SQLALCHEMY_DATABASE_URI
+    """
+    name = name or config['DB_ENGINE_PROFILE']
+    if name == 'auto':
+        dialect = make_url(url or config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+        name = _DIALECT_PROFILES.get(dialect, 'default')
+    if name not in config['DB_ENGINE_PROFILES']:
+        raise ValueError(f"Unknown engine profile '{name}' (expected auto or one of {sorted(config['DB_ENGINE_PROFILES'])})")
+    return name
+
+def apply_engine_options(app):
+    """Merges the profiles' engine options into the engine config.
+
+    Called before db.init_app, which creates the engines from it. The primary
+    gets DB_ENGINE_PROFILE through SQLALCHEMY_ENGINE_OPTIONS, where options
+    already set win over the profile's. The replica bind, if any, gets
+    DB_REPLICA_ENGINE_PROFILE, resolved against its own URL.
+    """
+    name = resolve_engine_profile(app.config)
+    app.config['DB_ENGINE_PROFILE_NAMES'] = {None: name} # Bind key -> resolved profile
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **app.config['DB_ENGINE_PROFILES'][name].get('engine_options', {}),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+
+    binds = app.config.get('SQLALCHEMY_BINDS', {})
+    replica_url = binds.get(REPLICA_BIND)
+    if isinstance(replica_url, str): # A dict already carries its own engine options
+        replica_name = resolve_engine_profile(app.config, app.config['DB_REPLICA_ENGINE_PROFILE'], replica_url)
+        app.config['DB_ENGINE_PROFILE_NAMES'][REPLICA_BIND] = replica_name
+        app.config['SQLALCHEMY_BINDS'] = {**binds, REPLICA_BIND: {
+            **app.config['DB_ENGINE_PROFILES'][replica_name].get('engine_options', {}),
+            'url': replica_url
+        }}
+
+def init_engine_events(app, engine, bind_key=None):
+    """Sets the SQLite PRAGMAs of the bind's profile on every new connection of engine."""
+    name = app.config['DB_ENGINE_PROFILE_NAMES'].get(bind_key)
+    pragmas = app.config['DB_ENGINE_PROFILES'][name].get('pragmas') if name else None
+    if pragmas and bind_key == REPLICA_BIND:
+        pragmas = {key: value for key, value in pragmas.items() if key not in _PERSISTENT_PRAGMAS}
+    if not pragmas or engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    app.logger.debug("SQLite PRAGMAs for new connections (bind %s): %s", bind_key or 'default', pragmas)
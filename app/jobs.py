@@ -0,0 +1,251 @@
+import os
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import BackgroundJob
+from app.logs import log_context
+
+# Registered job handlers: job_type -> {"handler": callable, "on_give_up": callable or None}
+JOB_HANDLERS = {}
+
+def register_job_handler(job_type, handler, on_give_up=None):
+    """Registers the function that runs jobs of the given type.
+
+    Args:
+        job_type (str): Name stored in BackgroundJob.job_type
+        handler (callable): Called with the job payload as keyword arguments.
+            Raising an exception marks the attempt as failed.
+        on_give_up (callable): Optional cleanup called with the payload once
+            the job has used all of its attempts
+    """
+    JOB_HANDLERS[job_type] = {"handler": handler, "on_give_up": on_give_up}
+
+# Housekeeping run by every job worker: name -> {"func": callable, "interval_key": config key}
+PERIODIC_TASKS = {}
+_periodic_last_run = {} # name -> time.monotonic() of the last run in this process
+
+def register_periodic_task(name, func, interval_key):
+    """Registers a function that job workers call every `interval_key` seconds.
+
+    Args:
+        name (str): Task name, used in logs
+        func (callable): Called without arguments inside the worker's app context
+        interval_key (str): Config key holding the interval in seconds (0 disables)
+    """
+    PERIODIC_TASKS[name] = {"func": func, "interval_key": interval_key}
+
+def run_periodic_tasks():
+    """Runs the periodic tasks that are due. Failures are logged, not raised."""
+    now = time.monotonic()
+    for name, task in PERIODIC_TASKS.items():
+        interval = current_app.config[task["interval_key"]]
+        last_run = _periodic_last_run.get(name)
+        if interval <= 0 or (last_run is not None and now - last_run < interval):
+            continue
+        _periodic_last_run[name] = now
+        try:
+            task["func"]()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Periodic task {name} failed: {e}", exc_info=True)
+
+def enqueue_job(job_type, payload, reference=None, max_attempts=None, commit=True, unique=False):
+    """Adds a job to the queue.
+
+    Args:
+        job_type (str): A registered job type (e.g., 'analyze_upload')
+        payload (dict): JSON-serializable keyword arguments for the handler
+        reference (str): Optional record identifier, e.g., 'student_upload:1'
+        max_attempts (int): Overrides JOB_MAX_ATTEMPTS from config
+        commit (bool): Commit the session; pass False to enqueue inside a larger transaction
+        unique (bool): Reuse a queued or running job with the same type and reference
+
+    Returns:
+        BackgroundJob: The queued job
+    """
+    if unique and reference:
+        pending = BackgroundJob.query.filter_by(job_type=job_type, reference=reference)\
+            .filter(BackgroundJob.status.in_(['queued', 'running'])).first()
+        if pending:
+            return pending
+
+    job = BackgroundJob(
+        job_type=job_type,
+        reference=reference,
+        status='queued',
+        attempts=0,
+        max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+        run_after=datetime.utcnow()
+    )
+    job.payload = payload
+    db.session.add(job)
+    if commit:
+        db.session.commit()
+    return job
+
+def get_latest_job(reference, job_type=None):
+    """Returns the most recent job for a record reference, or None."""
+    query = BackgroundJob.query.filter_by(reference=reference)
+    if job_type:
+        query = query.filter_by(job_type=job_type)
+    return query.order_by(BackgroundJob.id.desc()).first()
+
+def requeue_stale_jobs():
+    """Handles 'running' jobs whose worker stopped responding.
+
+    Jobs with attempts left go back in the queue; the others are marked as
+    failed and their on_give_up hook runs, so a job that crashes its worker
+    every time is not retried forever.
+
+    Returns:
+        int: Number of jobs requeued or failed
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_LOCK_TIMEOUT_SECONDS'])
+    stale = db.session.query(BackgroundJob.id, BackgroundJob.job_type, BackgroundJob.attempts,
+                             BackgroundJob.max_attempts, BackgroundJob.locked_by)\
+        .filter(BackgroundJob.status == 'running')\
+        .filter(BackgroundJob.locked_at < cutoff).all()
+
+    handled = 0
+    for job_id, job_type, attempts, max_attempts, locked_by in stale:
+        gave_up = attempts >= max_attempts
+        # Conditional on the lock, so a worker that was only slow and just finished wins
+        stmt = BackgroundJob.__table__.update().\
+            where(BackgroundJob.id == job_id).\
+            where(BackgroundJob.status == 'running').\
+            where(BackgroundJob.locked_by == locked_by).\
+            where(BackgroundJob.locked_at < cutoff).\
+            values(status='error' if gave_up else 'queued', locked_by=None, locked_at=None,
+                   last_error=f"Worker {locked_by} stopped responding on attempt {attempts}/{max_attempts}")
+        result = db.session.execute(stmt)
+        db.session.commit()
+        if result.rowcount != 1:
+            continue
+        handled += 1
+        if not gave_up:
+            current_app.logger.warning(f"Requeued stale job {job_id} ({job_type}) after attempt {attempts}/{max_attempts}")
+            continue
+
+        current_app.logger.error(f"Job {job_id} ({job_type}) failed permanently: its worker stopped responding on all {attempts} attempt(s)")
+        entry = JOB_HANDLERS.get(job_type)
+        if entry is not None and entry["on_give_up"]:
+            try:
+                entry["on_give_up"](**db.session.get(BackgroundJob, job_id).payload)
+            except Exception as cleanup_error:
+                db.session.rollback()
+                current_app.logger.error(f"Give-up hook for job {job_id} failed: {cleanup_error}")
+    return handled
+
+def claim_next_job(worker_id):
+    """Atomically claims the oldest due job.
+
+    The status transition 'queued' -> 'running' is a conditional UPDATE, so two
+    workers racing for the same row cannot both claim it.
+
+    Returns:
+        BackgroundJob: The claimed job, or None if nothing is due
+    """
+    now = datetime.utcnow()
+    candidate_ids = [row.id for row in db.session.query(BackgroundJob.id)
+                     .filter(BackgroundJob.status == 'queued')
+                     .filter(BackgroundJob.run_after <= now)
+                     .order_by(BackgroundJob.run_after, BackgroundJob.id)
+                     .limit(10)]
+
+    for job_id in candidate_ids:
+        stmt = BackgroundJob.__table__.update().\
+            where(BackgroundJob.id == job_id).\
+            where(BackgroundJob.status == 'queued').\
+            values(status='running', locked_by=worker_id, locked_at=now,
+                   attempts=BackgroundJob.attempts + 1)
+        result = db.session.execute(stmt)
+        db.session.commit()
+        if result.rowcount == 1:
+            return db.session.get(BackgroundJob, job_id)
+    return None
+
+def run_job(job):
+    """Runs a claimed job and records the outcome (complete, retry or error).
+
+    Returns:
+        bool: True if the handler succeeded
+    """
+    job_id = job.id
+    job_type = job.job_type
+    payload = job.payload
+    entry = JOB_HANDLERS.get(job_type)
+
+    try:
+        if entry is None:
+            raise LookupError(f"No handler registered for job type '{job_type}'")
+        with log_context(job_id=job_id, job_type=job_type, **payload):
+            entry["handler"](**payload)
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(BackgroundJob, job_id)
+        job.last_error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        job.locked_by = None
+        job.locked_at = None
+        if entry is not None and job.attempts < job.max_attempts:
+            # Exponential backoff: base, 2x base, 4x base, ...
+            delay = current_app.config['JOB_RETRY_BACKOFF_SECONDS'] * (2 ** (job.attempts - 1))
+            job.status = 'queued'
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+            db.session.commit()
+            current_app.logger.warning(f"Job {job_id} ({job_type}) failed on attempt {job.attempts}/{job.max_attempts}, retrying in {delay}s: {e}")
+        else:
+            job.status = 'error'
+            db.session.commit()
+            current_app.logger.error(f"Job {job_id} ({job_type}) failed permanently after {job.attempts} attempt(s): {e}")
+            if entry is not None and entry["on_give_up"]:
+                try:
+                    entry["on_give_up"](**payload)
+                except Exception as cleanup_error:
+                    db.session.rollback()
+                    current_app.logger.error(f"Give-up hook for job {job_id} failed: {cleanup_error}")
+        return False
+
+    job = db.session.get(BackgroundJob, job_id)
+    job.status = 'complete'
+    job.completed_at = datetime.utcnow()
+    job.locked_by = None
+    job.locked_at = None
+    db.session.commit()
+    return True
+
+def run_worker(poll_interval=None, burst=False):
+    """Processes queued jobs until interrupted. Must run inside an app context.
+
+    Args:
+        poll_interval (float): Seconds to sleep when the queue is empty
+            (defaults to JOB_POLL_INTERVAL_SECONDS)
+        burst (bool): Return once the queue is empty instead of polling
+
+    Returns:
+        int: Number of jobs processed
+    """
+    # Importing services registers its job handlers
+    import app.services # noqa: F401
+
+    poll_interval = poll_interval if poll_interval is not None else current_app.config['JOB_POLL_INTERVAL_SECONDS']
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    current_app.logger.info(f"Job worker {worker_id} started")
+
+    while True:
+        requeue_stale_jobs()
+        run_periodic_tasks()
+        job = claim_next_job(worker_id)
+        if job is None:
+            if burst:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        current_app.logger.info(f"Worker {worker_id} running job {job.id} ({job.job_type}), attempt {job.attempts}")
+        run_job(job)
+        processed += 1
+        db.session.remove()
@@ -0,0 +1,240 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from flask import g, request
+from flask.logging import default_handler
+from app.metrics import register_collector
+
+# Correlation fields (request_id, upload_id, job_id, ...) attached to every
+# record logged in the current request, job or thread
+_log_context = contextvars.ContextVar('log_context', default={})
+
+# LogRecord attributes that are not extra fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_writer = None
+_writer_lock = threading.Lock()
+
+@contextmanager
+def log_context(**fields):
+    """Adds correlation fields to every record logged inside the block
+    (including by run_concurrently worker threads, which copy the context)."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, correlation
+    fields and any `extra` fields of the call."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development, correlation fields appended."""
+
+    def __init__(self):
+        super().__init__('[%(asctime)s] %(levelname)s in %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = {key: value for key, value in record.__dict__.items()
+                  if key not in _RECORD_ATTRIBUTES and not key.startswith('_')}
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+class LogWriter:
+    """Formats and writes queued records on a background thread.
+
+    Callers only enqueue; the writer drains the queue in batches and flushes
+    once per batch, so request threads never block on stdout or the log
+    file. When the queue is full, records are dropped and counted instead.
+    """
+
+    def __init__(self, stream, formatter, max_queue, batch_size=500):
+        self.stream = stream
+        self.formatter = formatter
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1 # Approximate under contention; only used for monitoring
+
+    def stop(self, timeout=5):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            lines = []
+            for record in batch:
+                if record is None:
+                    continue
+                try:
+                    lines.append(self.formatter.format(record) + "\n")
+                except Exception:
+                    lines.append(f"Unformattable log record from {record.name}: {record.msg!r}\n")
+            try:
+                self.stream.write("".join(lines))
+                self.stream.flush()
+            except Exception:
+                pass # Nowhere left to report this
+            self.written += len(lines)
+            if stop:
+                return
+
+class AsyncHandler(logging.Handler):
+    """Hands records to the LogWriter after attaching correlation fields and
+    applying per-logger sampling."""
+
+    def __init__(self, writer, sample_rates):
+        super().__init__()
+        self.writer = writer
+        self.sample_rates = sample_rates # logger name -> share of records kept
+
+    def emit(self, record):
+        rate = self._sample_rate(record.name)
+        if rate < 1.0 and record.levelno < logging.WARNING:
+            if random.random() >= rate:
+                return
+            record.sample_rate = rate # Lets readers scale counts back up
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        # Resolve the message now; arguments may change before the writer formats it
+        record.msg = record.getMessage()
+        record.args = None
+        self.writer.put(record)
+
+    def _sample_rate(self, name):
+        while name:
+            if name in self.sample_rates:
+                return self.sample_rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+def parse_levels(spec):
+    """'app.routes=WARNING,app.services=DEBUG' -> {'app.routes': 'WARNING', ...}"""
+    levels = {}
+    for item in (spec or "").split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def parse_sample_rates(spec):
+    """'app.routes.answers=0.01' -> {'app.routes.answers': 0.01}"""
+    return {name: min(1.0, max(0.0, float(rate))) for name, rate in parse_levels(spec).items()}
+
+def init_app(app):
+    """Routes the app's logs (the 'app' logger and all app.* modules) through
+    the async writer and tags request logs with a request ID."""
+    config = app.config
+    writer = _get_writer(config)
+    logger = logging.getLogger('app')
+    for handler in list(logger.handlers):
+        if isinstance(handler, AsyncHandler) or handler is default_handler:
+            logger.removeHandler(handler) # Replaces Flask's handler and those of earlier apps in this process
+    logger.addHandler(AsyncHandler(writer, parse_sample_rates(config['LOG_SAMPLE_RATES'])))
+    logger.setLevel(config['LOG_LEVEL'].upper())
+    logger.propagate = False
+    for name, level in parse_levels(config['LOG_LEVELS']).items():
+        logging.getLogger(name).setLevel(level)
+
+    @app.before_request
+    def _bind_request_id():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.log_context_token = _log_context.set({**_log_context.get(), "request_id": g.request_id})
+
+    @app.after_request
+    def _return_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+    @app.teardown_request
+    def _unbind_request_id(exc):
+        token = g.pop('log_context_token', None)
+        if token is not None:
+            try:
+                _log_context.reset(token)
+            except ValueError:
+                pass # Set in another context (e.g., a streamed response generator)
+
+def _get_writer(config):
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            stream = open(config['LOG_FILE'], 'a', encoding='utf-8') if config['LOG_FILE'] else sys.stdout
+            formatter = JsonFormatter() if config['LOG_FORMAT'] == 'json' else TextFormatter()
+            _writer = LogWriter(stream, formatter, config['LOG_QUEUE_SIZE'])
+        return _writer
+
+def _stop_writer():
+    # Writes out everything queued so far at exit
+    if _writer is not None:
+        _writer.stop()
+
+def _reset_writer_after_fork():
+    # The writer thread does not survive a fork; start a new one on the same stream
+    global _writer, _writer_lock
+    _writer_lock = threading.Lock()
+    if _writer is not None:
+        old = _writer
+        _writer = LogWriter(old.stream, old.formatter, old.queue.maxsize)
+        for handler in logging.getLogger('app').handlers:
+            if isinstance(handler, AsyncHandler):
+                handler.writer = _writer
+
+def _collect_log_metrics():
+    if _writer is None:
+        return []
+    return [('bonsai_log_records', 'gauge', "Log records written and dropped (queue full) by this process",
+             [({"stat": "written"}, _writer.written), ({"stat": "dropped"}, _writer.dropped),
+              ({"stat": "queued"}, _writer.queue.qsize())])]
+
+register_collector(_collect_log_metrics)
+atexit.register(_stop_writer)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_writer_after_fork)
@@ -0,0 +1,246 @@
+import hmac
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from flask import Response, current_app, g, has_request_context, request, abort
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Metrics are kept per process: the web app serves them on /metrics, and the
+# workers on their own port (METRICS_WORKER_PORT / --metrics-port)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_metrics = [] # Registration order is export order
+_collectors = []
+_registry_lock = threading.Lock()
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {} # label values tuple -> value
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _metrics.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = list(self._samples())
+        for suffix, labels, value in items:
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    """Monotonic total, e.g. requests or tokens."""
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield "", tuple(zip(self.labelnames, key)), value
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, e.g. latencies."""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        for key, state in self._values.items():
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                yield "_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield "_sum", labels, state["sum"]
+            yield "_count", labels, state["count"]
+
+def register_collector(func):
+    """Registers a function that reports values kept elsewhere (e.g., cache stats).
+
+    func() is called on every scrape and returns a list of
+    (name, type, help, [(labels dict, value), ...]) families.
+    """
+    with _registry_lock:
+        _collectors.append(func)
+
+def render_metrics():
+    """Returns all metrics of this process in the Prometheus text format."""
+    with _registry_lock:
+        metrics = list(_metrics)
+        collectors = list(_collectors)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for collector in collectors:
+        try:
+            families = collector()
+        except Exception as e:
+            current_app.logger.error(f"Metrics collector {collector.__name__} failed: {e}")
+            continue
+        for name, type_name, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {type_name}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(tuple(labels.items()))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels) + "}"
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+REQUEST_LATENCY = Histogram(
+    'bonsai_request_duration_seconds', "Time to produce a response, by endpoint (streamed bodies excluded)",
+    ('endpoint', 'method', 'status')
+)
+REQUEST_DB_QUERIES = Histogram(
+    'bonsai_request_db_queries', "DB statements issued per request, by endpoint",
+    ('endpoint',), buckets=COUNT_BUCKETS
+)
+DB_QUERIES = Counter(
+    'bonsai_db_queries_total', "DB statements issued, by endpoint ('background' outside requests)",
+    ('endpoint',)
+)
+STAGE_LATENCY = Histogram(
+    'bonsai_stage_duration_seconds', "Time spent in each processing stage",
+    ('stage',)
+)
+LLM_LATENCY = Histogram(
+    'bonsai_llm_call_duration_seconds', "OpenAI call latency per attempt (time to first byte for streams), by ai_service function",
+    ('function', 'outcome')
+)
+LLM_TOKENS = Counter(
+    'bonsai_llm_tokens_total', "Tokens reported by OpenAI usage, by ai_service function",
+    ('function', 'type')
+)
+
+def stage_timer(stage):
+    """Context manager that records the duration of a processing stage."""
+    return STAGE_LATENCY.time(stage=stage)
+
+def observe_stage(stage, seconds):
+    STAGE_LATENCY.observe(seconds, stage=stage)
+
+def record_llm_call(function, seconds, outcome='ok', usage=None):
+    """Records one OpenAI call attempt and, if the response had usage, its tokens."""
+    LLM_LATENCY.observe(seconds, function=function, outcome=outcome)
+    if usage is not None:
+        LLM_TOKENS.inc(getattr(usage, 'prompt_tokens', 0) or 0, function=function, type='prompt')
+        LLM_TOKENS.inc(getattr(usage, 'completion_tokens', 0) or 0, function=function, type='completion')
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_db_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics_db_queries' in g:
+        g.metrics_db_queries += 1
+        DB_QUERIES.inc(endpoint=request.endpoint or 'unmatched')
+    else:
+        DB_QUERIES.inc(endpoint='background')
+
+def init_app(app):
+    """Times every request and serves /metrics (unless METRICS_ENABLED is false)."""
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_started_at = time.perf_counter()
+        g.metrics_db_queries = 0
+
+    @app.after_request
+    def _record_request(response):
+        if 'metrics_started_at' in g:
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_LATENCY.observe(time.perf_counter() - g.metrics_started_at,
+                                    endpoint=endpoint, method=request.method, status=response.status_code)
+            REQUEST_DB_QUERIES.observe(g.metrics_db_queries, endpoint=endpoint)
+        return response
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+def metrics_view():
+    token = current_app.config['METRICS_AUTH_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        abort(401)
+    return Response(render_metrics(), mimetype=CONTENT_TYPE)
+
+def start_metrics_server(app, port, host='0.0.0.0'):
+    """Serves this process's metrics on a background thread (for the workers,
+    which have no web server). Returns the server."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            token = app.config['METRICS_AUTH_TOKEN']
+            if token and not hmac.compare_digest(self.headers.get('Authorization', ''), f"Bearer {token}"):
+                self.send_error(401)
+                return
+            with app.app_context():
+                body = render_metrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # Scrapes every few seconds would flood the worker output
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    app.logger.info(f"Serving worker metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
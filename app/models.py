@@ -19,6 +19,7 @@ class User(db.Model):
     # email = db.Column(db.String(120), index=True, unique=True) # Optional
     # password_hash = db.Column(db.String(128)) # If login needed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_write_at = db.Column(db.DateTime, nullable=True) # Last request that committed a write; reads stay on the primary shortly after (app/db_routing.py)
 
     uploads = db.relationship('StudentUpload', backref='student', lazy='dynamic')
     quizzes = db.relationship('CustomQuiz', backref='student', lazy='dynamic')
@@ -31,6 +32,8 @@ class User(db.Model):
 
     def generate_api_key(self):
         """Generates a unique API key."""
+        from app.auth import invalidate_api_key # Avoid circular import
+        invalidate_api_key(self.api_key) # Rotated keys must stop authenticating
         self.api_key = secrets.token_urlsafe(32) # Generate a 32-byte token
 
     def __repr__(self):
@@ -46,6 +49,25 @@ class Skill(db.Model):
     def __repr__(self):
         return f'<Skill {self.name}>'
 
+class SkillAlias(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    alias_key = db.Column(db.String(128), unique=True, nullable=False) # normalize_skill_name() of a spelling
+    skill_id = db.Column(db.Integer, db.ForeignKey('skill.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    skill = db.relationship('Skill', backref=db.backref('aliases', lazy='dynamic'))
+
+    def __repr__(self):
+        return f'<SkillAlias {self.alias_key} -> {self.skill_id}>'
+
+@db.event.listens_for(Skill, 'after_insert')
+def _add_canonical_alias(mapper, connection, target):
+    # Every skill is reachable through the alias table by its own normalized name
+    from app.utils import normalize_skill_name, dialect_insert
+    connection.execute(dialect_insert(SkillAlias.__table__, bind=connection).values(
+        alias_key=normalize_skill_name(target.name), skill_id=target.id, created_at=datetime.utcnow()
+    ).on_conflict_do_nothing())
+
 class PracticeTest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     identifier = db.Column(db.String(128), unique=True, nullable=False) # e.g., "Bluebook Test 4"
@@ -61,6 +83,8 @@ class StudentUpload(db.Model):
     practice_test_id = db.Column(db.Integer, db.ForeignKey('practice_test.id'), nullable=False)
     upload_timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     temp_storage_ref = db.Column(db.String(256)) # Path or identifier for temporary file
+    content_sha256 = db.Column(db.String(64), index=True) # Hash of the uploaded content
+    size_bytes = db.Column(db.Integer)
     processing_status = db.Column(db.String(64), default='pending') # e.g., 'pending', 'processing', 'complete', 'error'
     # Note: Actual file content should not be stored here long-term
 
@@ -119,6 +143,33 @@ class QuizQuestion(db.Model):
     def __repr__(self):
         return f'<QuizQuestion {self.id} for Skill {self.skill.name}>'
 
+class BankedQuestion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    skill_id = db.Column(db.Integer, db.ForeignKey('skill.id'), nullable=False)
+    question_text = db.Column(db.Text, nullable=False)
+    options_json = db.Column(db.Text)
+    correct_option = db.Column(db.String(16))
+    prompt_version = db.Column(db.String(32), nullable=False)
+    model = db.Column(db.String(64), nullable=False)
+    generation_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    served_at = db.Column(db.DateTime, nullable=True) # Null while the question is still available
+    claim_token = db.Column(db.String(32), index=True) # Set by the request that took the question
+
+    skill = db.relationship('Skill')
+
+    __table_args__ = (db.Index('ix_banked_question_skill_id_served_at', 'skill_id', 'served_at'),)
+
+    @property
+    def options(self):
+        return json.loads(self.options_json) if self.options_json else {}
+
+    @options.setter
+    def options(self, value):
+        self.options_json = json.dumps(value)
+
+    def __repr__(self):
+        return f'<BankedQuestion {self.id} for Skill {self.skill_id}>'
+
 class QuizAttempt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -135,8 +186,12 @@ class VideoQueue(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     skill_id = db.Column(db.Integer, db.ForeignKey('skill.id'), nullable=False)
     quiz_attempt_id = db.Column(db.Integer, db.ForeignKey('quiz_attempt.id')) # Link to the attempt that triggered this
-    status = db.Column(db.String(64), default='queued') # e.g., 'queued', 'generating', 'delivered', 'error'
+    status = db.Column(db.String(64), index=True, default='queued') # e.g., 'queued', 'generating', 'delivered', 'error'
     queue_timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
+    generation_started_at = db.Column(db.DateTime, nullable=True) # Set when a worker claims the item
+    script_stream_path = db.Column(db.String(256), nullable=True) # Partial script file while streaming
+    script_bytes = db.Column(db.Integer, default=0) # Script bytes written so far (streaming progress)
+    progress_updated_at = db.Column(db.DateTime, nullable=True)
     delivery_timestamp = db.Column(db.DateTime, nullable=True)
 
     skill = db.relationship('Skill')
@@ -160,6 +215,69 @@ class VideoLesson(db.Model):
     def __repr__(self):
         return f'<VideoLesson {self.id} for Skill {self.skill.name}>'
 
+class VideoScriptCache(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), index=True, nullable=False) # SHA-256 of skill, prompt version and model
+    skill_id = db.Column(db.Integer, db.ForeignKey('skill.id'), nullable=False)
+    prompt_version = db.Column(db.String(32), nullable=False)
+    model = db.Column(db.String(64), nullable=False)
+    content_sha256 = db.Column(db.String(64), nullable=False) # Scripts are stored by content hash
+    script_path = db.Column(db.String(256), nullable=False) # Shared file referenced by VideoLesson.video_ref
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, index=True, default=datetime.utcnow) # For LRU eviction
+    use_count = db.Column(db.Integer, default=0)
+
+    skill = db.relationship('Skill')
+
+    __table_args__ = (db.UniqueConstraint('cache_key', 'content_sha256'),)
+
+    def __repr__(self):
+        return f'<VideoScriptCache {self.id} for Skill {self.skill_id} ({self.prompt_version}, {self.model})>'
+
+class UploadClassificationCache(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    content_sha256 = db.Column(db.String(64), nullable=False) # StudentUpload.content_sha256
+    practice_test_id = db.Column(db.Integer, db.ForeignKey('practice_test.id'), nullable=False)
+    prompt_version = db.Column(db.String(32), nullable=False)
+    model = db.Column(db.String(64), nullable=False)
+    skills_json = db.Column(db.Text, nullable=False) # JSON list of {"name", "category"}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow)
+    hit_count = db.Column(db.Integer, default=0)
+
+    __table_args__ = (db.UniqueConstraint('content_sha256', 'practice_test_id', 'prompt_version', 'model'),)
+
+    @property
+    def skills(self):
+        return json.loads(self.skills_json)
+
+    @skills.setter
+    def skills(self, value):
+        self.skills_json = json.dumps(value)
+
+    def __repr__(self):
+        return f'<UploadClassificationCache {self.id} for {self.content_sha256[:12]} ({self.prompt_version}, {self.model})>'
+
+class ClassificationCacheEntry(db.Model):
+    __tablename__ = 'classification_cache'
+    id = db.Column(db.Integer, primary_key=True)
+    content_digest = db.Column(db.String(64), nullable=False) # SHA-256 of the case- and whitespace-normalized text
+    prompt_version = db.Column(db.String(32), nullable=False)
+    model = db.Column(db.String(64), nullable=False)
+    skills_json = db.Column(db.Text, nullable=False) # JSON list of {"name", "category"}
+    created_at = db.Column(db.DateTime, index=True, default=datetime.utcnow) # For TTL expiry
+    last_used_at = db.Column(db.DateTime, index=True, default=datetime.utcnow) # For LRU eviction
+    hit_count = db.Column(db.Integer, default=0)
+
+    __table_args__ = (db.UniqueConstraint('content_digest', 'prompt_version', 'model'),)
+
+    @property
+    def skills(self):
+        return json.loads(self.skills_json)
+
+    def __repr__(self):
+        return f'<ClassificationCacheEntry {self.id} for {self.content_digest[:12]} ({self.prompt_version}, {self.model})>'
+
 class PracticeQuestion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     skill_id = db.Column(db.Integer, db.ForeignKey('skill.id'), nullable=False)
@@ -203,4 +321,41 @@ class BonsaiGrowth(db.Model):
     last_growth_timestamp = db.Column(db.DateTime, nullable=True)
 
     def __repr__(self):
-        return f'<BonsaiGrowth User {self.user_id}: {self.branch_count} branches>' 
\ No newline at end of file
+        return f'<BonsaiGrowth User {self.user_id}: {self.branch_count} branches>'
+
+class BackgroundJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(64), index=True, nullable=False) # e.g., 'analyze_upload'
+    payload_json = db.Column(db.Text) # Handler arguments as JSON: {"upload_id": 1}
+    reference = db.Column(db.String(128), index=True) # Record the job works on, e.g., 'student_upload:1'
+    status = db.Column(db.String(64), index=True, default='queued') # e.g., 'queued', 'running', 'complete', 'error'
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    run_after = db.Column(db.DateTime, index=True, default=datetime.utcnow) # Not picked up before this time (retry backoff)
+    locked_by = db.Column(db.String(128)) # Worker identifier that claimed the job
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def payload(self):
+        return json.loads(self.payload_json) if self.payload_json else {}
+
+    @payload.setter
+    def payload(self, value):
+        self.payload_json = json.dumps(value)
+
+    def __repr__(self):
+        return f'<BackgroundJob {self.id} {self.job_type} ({self.status})>'
+
+class GenerationLease(db.Model):
+    lease_key = db.Column(db.String(64), primary_key=True) # SHA-256 of function, arguments, prompt version and model
+    holder = db.Column(db.String(128), nullable=False) # Process/thread making the AI call
+    expires_at = db.Column(db.DateTime, index=True, nullable=False) # Lease (or shared result) is stale after this
+    result_json = db.Column(db.Text) # Shared result once the call completes (progress data while in flight)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<GenerationLease {self.lease_key[:12]} held by {self.holder}>'
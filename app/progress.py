@@ -0,0 +1,77 @@
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, or_
+from app import db
+from app.models import user_skill_progress
+from app.utils import dialect_insert
+
+# Allowed user_skill_progress transitions: new status -> statuses it may replace.
+# A pair without a row yet can start in any status.
+ALLOWED_TRANSITIONS = {
+    'missed': {'missed', 'quiz_correct', 'video_queued', 'video_delivered', 'video_watched', 'practice_failed', 'mastered'}, # A new upload flags the skill again
+    'quiz_correct': {'missed', 'quiz_correct', 'video_queued', 'video_delivered', 'video_watched', 'practice_failed'},
+    'video_queued': {'missed', 'quiz_correct', 'video_queued', 'video_delivered', 'video_watched', 'practice_failed'},
+    'video_delivered': {'missed', 'video_queued', 'video_delivered', 'practice_failed'},
+    'video_watched': {'missed', 'video_queued', 'video_delivered', 'video_watched', 'practice_failed'},
+    'practice_failed': {'video_delivered', 'video_watched', 'practice_failed'},
+    'mastered': {'video_delivered', 'video_watched', 'practice_failed'}, # Practice may be submitted without marking the video watched
+}
+
+class InvalidProgressTransition(ValueError):
+    pass
+
+def can_transition(current_status, new_status):
+    """True if a progress row in current_status (None: no row) may move to new_status."""
+    return current_status is None or current_status in ALLOWED_TRANSITIONS[new_status]
+
+def apply_progress_transitions(changes, strict=False):
+    """Applies a batch of progress status changes in one statement.
+
+    Uses INSERT ... ON CONFLICT (user_id, skill_id) DO UPDATE, so missing
+    rows are created and existing ones updated without loading them first.
+    The update only happens when ALLOWED_TRANSITIONS permits it, checked by
+    the database against the row's current status, so concurrent requests
+    cannot sneak in a disallowed transition. Runs in the caller's
+    transaction; the caller commits.
+
+    Args:
+        changes (iterable): (user_id, skill_id, status) tuples; for repeated
+            pairs the last status wins
+        strict (bool): Raise InvalidProgressTransition if any change was rejected
+
+    Returns:
+        set: (user_id, skill_id) pairs that were written; rejected changes
+            are logged and left unchanged
+    """
+    latest = {}
+    for user_id, skill_id, status in changes:
+        if status not in ALLOWED_TRANSITIONS:
+            raise ValueError(f"Unknown progress status '{status}'")
+        latest[(user_id, skill_id)] = status
+    if not latest:
+        return set()
+
+    now = datetime.utcnow()
+    stmt = dialect_insert(user_skill_progress).values([
+        {"user_id": user_id, "skill_id": skill_id, "status": status, "last_updated": now}
+        for (user_id, skill_id), status in latest.items()
+    ])
+    allowed = or_(user_skill_progress.c.status.is_(None), *[
+        and_(stmt.excluded.status == status, user_skill_progress.c.status.in_(sorted(sources)))
+        for status, sources in ALLOWED_TRANSITIONS.items()
+        if status in latest.values()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[user_skill_progress.c.user_id, user_skill_progress.c.skill_id],
+        set_={"status": stmt.excluded.status, "last_updated": stmt.excluded.last_updated},
+        where=allowed
+    ).returning(user_skill_progress.c.user_id, user_skill_progress.c.skill_id)
+
+    written = {(row.user_id, row.skill_id) for row in db.session.execute(stmt)}
+    rejected = {pair: status for pair, status in latest.items() if pair not in written}
+    if rejected:
+        message = f"Rejected progress transitions (user, skill) -> status: {rejected}"
+        if strict:
+            raise InvalidProgressTransition(message)
+        current_app.logger.warning(message)
+    return written
@@ -0,0 +1,153 @@
+import uuid
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from app.models import BankedQuestion, Skill
+from app import ai_service
+from app.jobs import enqueue_job, register_job_handler
+
+def take_questions(skill_counts, claim_token=None):
+    """Takes unserved questions from the bank for several skills at once.
+
+    Candidates are read in one query and claimed with a single conditional
+    UPDATE, so two requests never receive the same question. Skills that fall
+    below QUESTION_BANK_LOW_WATERMARK get a refill job queued. The claim is
+    committed right away so no write lock is held while the caller generates
+    the missing questions; a caller that fails before storing them must hand
+    them back with release_questions(claim_token).
+
+    Args:
+        skill_counts (dict): skill_id -> number of questions wanted
+        claim_token (str): Marks the claimed rows (defaults to a new token)
+
+    Returns:
+        dict: skill_id -> list of question data dicts (may be shorter than
+            requested when the bank runs low; the caller generates the rest)
+    """
+    taken = {skill_id: [] for skill_id in skill_counts}
+    if not skill_counts or not current_app.config['QUESTION_BANK_ENABLED']:
+        return taken
+
+    candidates = _unserved_query().filter(BankedQuestion.skill_id.in_(list(skill_counts)))\
+        .order_by(BankedQuestion.id).with_entities(BankedQuestion.id, BankedQuestion.skill_id).all()
+
+    wanted_ids = []
+    per_skill = {skill_id: 0 for skill_id in skill_counts}
+    for question_id, skill_id in candidates:
+        if per_skill[skill_id] < skill_counts[skill_id]:
+            wanted_ids.append(question_id)
+            per_skill[skill_id] += 1
+
+    if wanted_ids:
+        claim_token = claim_token or new_claim_token()
+        stmt = BankedQuestion.__table__.update().\
+            where(BankedQuestion.id.in_(wanted_ids)).\
+            where(BankedQuestion.served_at.is_(None)).\
+            values(served_at=datetime.utcnow(), claim_token=claim_token)
+        db.session.execute(stmt)
+        for question in BankedQuestion.query.filter_by(claim_token=claim_token).order_by(BankedQuestion.id):
+            taken[question.skill_id].append({
+                "question_text": question.question_text,
+                "options": question.options,
+                "correct_option": question.correct_option
+            })
+
+    # Unserved questions left per skill after this claim
+    remaining = {skill_id: sum(1 for _, s in candidates if s == skill_id) - len(taken[skill_id])
+                 for skill_id in skill_counts}
+    for skill_id, count in remaining.items():
+        if count < current_app.config['QUESTION_BANK_LOW_WATERMARK']:
+            enqueue_job('refill_question_bank', {"skill_id": skill_id},
+                        reference=f"skill:{skill_id}", commit=False, unique=True)
+    db.session.commit()
+
+    hits = sum(len(questions) for questions in taken.values())
+    current_app.logger.info(f"Question bank served {hits}/{sum(skill_counts.values())} questions")
+    return taken
+
+def new_claim_token():
+    return uuid.uuid4().hex
+
+def release_questions(claim_token):
+    """Returns the questions claimed with claim_token to the bank (commits).
+
+    Returns:
+        int: Number of questions released
+    """
+    stmt = BankedQuestion.__table__.update().\
+        where(BankedQuestion.claim_token == claim_token).\
+        values(served_at=None, claim_token=None)
+    released = db.session.execute(stmt).rowcount
+    db.session.commit()
+    if released:
+        current_app.logger.info(f"Returned {released} unused question(s) to the question bank")
+    return released
+
+def refill_question_bank(skill_id):
+    """Tops up a skill's unserved questions to QUESTION_BANK_TARGET_SIZE.
+
+    Runs as the 'refill_question_bank' background job. Questions are requested
+    in batches (one AI call per QUESTION_BANK_REFILL_BATCH questions) and only
+    validated questions are stored.
+
+    Returns:
+        int: Number of questions added
+    """
+    config = current_app.config
+    skill = db.session.get(Skill, skill_id)
+    if not skill:
+        return 0
+
+    missing = config['QUESTION_BANK_TARGET_SIZE'] - _unserved_query().filter(BankedQuestion.skill_id == skill_id).count()
+    added = 0
+    while missing > 0:
+        batch_size = min(missing, config['QUESTION_BANK_REFILL_BATCH'])
+        questions = [q for q in ai_service.generate_practice_questions(skill.name, skill.category, count=batch_size, shared=False)
+                     if ai_service.is_valid_question(q) and not ai_service.is_fallback_question(q)]
+        if not questions:
+            raise RuntimeError(f"No valid questions generated for skill '{skill.name}'") # Retried by the job queue
+
+        for question_data in questions:
+            question = BankedQuestion(
+                skill_id=skill.id,
+                question_text=question_data["question_text"],
+                correct_option=question_data["correct_option"],
+                prompt_version=ai_service.QUIZ_QUESTION_PROMPT_VERSION,
+                model=config['OPENAI_MODEL']
+            )
+            question.options = question_data["options"]
+            db.session.add(question)
+        db.session.commit() # Commit per batch so partial progress is kept
+        added += len(questions)
+        missing -= len(questions)
+
+    current_app.logger.info(f"Question bank refilled with {added} questions for skill '{skill.name}'")
+    return added
+
+def queue_low_skills():
+    """Queues refill jobs for every skill below the low watermark.
+
+    Returns:
+        int: Number of skills queued
+    """
+    counts = dict(_unserved_query().with_entities(BankedQuestion.skill_id, func.count(BankedQuestion.id))
+                  .group_by(BankedQuestion.skill_id).all())
+    queued = 0
+    for (skill_id,) in db.session.query(Skill.id):
+        if counts.get(skill_id, 0) < current_app.config['QUESTION_BANK_LOW_WATERMARK']:
+            enqueue_job('refill_question_bank', {"skill_id": skill_id},
+                        reference=f"skill:{skill_id}", commit=False, unique=True)
+            queued += 1
+    db.session.commit()
+    return queued
+
+def _unserved_query():
+    # Only questions from the current prompt and model are served
+    return BankedQuestion.query.filter(
+        BankedQuestion.served_at.is_(None),
+        BankedQuestion.prompt_version == ai_service.QUIZ_QUESTION_PROMPT_VERSION,
+        BankedQuestion.model == current_app.config['OPENAI_MODEL']
+    )
+
+register_job_handler('refill_question_bank', refill_question_bank)
@@ -0,0 +1,212 @@
+import os
+import random
+import threading
+import time
+import openai
+from flask import current_app
+from app.metrics import register_collector
+
+class TokenBucket:
+    """Continuously refilling token bucket (e.g., requests or tokens per minute)."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0 # Tokens added per second
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, amount=1):
+        """Blocks until `amount` tokens are available and takes them."""
+        amount = min(amount, self.capacity) # A single oversized request must still get through
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def adjust(self, amount):
+        """Returns (negative) or charges (positive) tokens after the fact, e.g., when
+        the actual token usage of a call differs from the estimate."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit: grows by ~1 per window of successful fast calls and
+    halves on rate-limit errors (shrinks gently when latency exceeds the target)."""
+
+    def __init__(self, initial_limit, min_limit, max_limit, latency_target):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency=None, throttled=False):
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit / 2)
+            elif latency is not None and latency > self.latency_target:
+                self.limit = max(self.min_limit, self.limit * 0.9)
+            elif latency is not None:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+class OpenAIRateLimiter:
+    """Process-wide throttle for OpenAI calls: RPM and TPM token buckets, adaptive
+    concurrency and jittered retries that honor Retry-After."""
+
+    RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError,
+                        openai.APIConnectionError, openai.InternalServerError)
+
+    def __init__(self, config):
+        self.requests = TokenBucket(config['AI_REQUESTS_PER_MINUTE'])
+        self.tokens = TokenBucket(config['AI_TOKENS_PER_MINUTE'])
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial_limit=config['AI_MAX_CONCURRENCY'],
+            min_limit=1,
+            max_limit=config['AI_ADAPTIVE_MAX_CONCURRENCY'],
+            latency_target=config['AI_LATENCY_TARGET_SECONDS']
+        )
+        self.max_attempts = config['AI_RETRY_MAX_ATTEMPTS']
+        self.backoff_base = config['AI_RETRY_BACKOFF_SECONDS']
+        self.backoff_max = config['AI_RETRY_BACKOFF_MAX_SECONDS']
+        self.stats_lock = threading.Lock()
+        self.counters = {
+            "calls": 0,
+            "throttled": 0, # 429 responses
+            "retries": 0,
+            "failures": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0
+        }
+
+    def call(self, func, estimated_tokens, **kwargs):
+        """Calls func(**kwargs) once capacity is available, retrying transient errors.
+
+        Args:
+            func (callable): e.g., client.chat.completions.create
+            estimated_tokens (int): Expected prompt + completion tokens, charged
+                up front and corrected from response.usage afterwards
+
+        Returns:
+            The response of func
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            wait_started = time.monotonic()
+            self.concurrency.acquire()
+            try:
+                self.requests.acquire(1)
+                self.tokens.acquire(estimated_tokens)
+            except BaseException:
+                self.concurrency.release()
+                raise
+            self._record_wait(time.monotonic() - wait_started)
+
+            started = time.monotonic()
+            try:
+                response = func(**kwargs)
+            except self.RETRYABLE_ERRORS as e:
+                throttled = isinstance(e, openai.RateLimitError)
+                self.concurrency.release(throttled=throttled)
+                self._count("throttled" if throttled else None)
+                if attempt == self.max_attempts:
+                    self._count("failures")
+                    raise
+                delay = self._retry_delay(e, attempt)
+                self._count("retries")
+                current_app.logger.warning(f"OpenAI call failed ({type(e).__name__}), retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self.concurrency.release()
+                self._count("failures")
+                raise
+
+            self.concurrency.release(latency=time.monotonic() - started)
+            usage = getattr(response, 'usage', None)
+            if usage is not None and getattr(usage, 'total_tokens', None):
+                self.tokens.adjust(usage.total_tokens - estimated_tokens)
+            self._count("calls")
+            return response
+
+    def _retry_delay(self, error, attempt):
+        """Retry-After from the response if present, else full-jitter exponential backoff."""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        retry_after = None
+        try:
+            if headers.get('retry-after-ms'):
+                retry_after = float(headers['retry-after-ms']) / 1000
+            elif headers.get('retry-after'):
+                retry_after = float(headers['retry-after'])
+        except ValueError:
+            retry_after = None # HTTP-date values fall back to backoff
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max) + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record_wait(self, seconds):
+        with self.stats_lock:
+            self.counters["queue_wait_seconds_total"] += seconds
+            self.counters["queue_wait_seconds_max"] = max(self.counters["queue_wait_seconds_max"], seconds)
+
+    def _count(self, name):
+        if name:
+            with self.stats_lock:
+                self.counters[name] += 1
+
+    def stats(self):
+        with self.stats_lock:
+            stats = dict(self.counters)
+        attempts = stats["calls"] + stats["retries"] + stats["failures"]
+        stats["queue_wait_seconds_avg"] = stats["queue_wait_seconds_total"] / attempts if attempts else 0.0
+        stats["concurrency_limit"] = int(self.concurrency.limit)
+        stats["in_flight"] = self.concurrency.in_flight
+        return stats
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Returns the process-wide OpenAI rate limiter, configured on first use."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = OpenAIRateLimiter(current_app.config)
+    return _rate_limiter
+
+def _reset_rate_limiter_after_fork():
+    # Locks may have been held by other threads at fork time; start fresh
+    global _rate_limiter, _rate_limiter_lock
+    _rate_limiter = None
+    _rate_limiter_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_rate_limiter_after_fork)
+
+def _collect_rate_limiter_metrics():
+    if _rate_limiter is None:
+        return [] # No AI call made in this process yet
+    return [('bonsai_ai_rate_limiter', 'gauge', "OpenAI rate limiter counters and current limits (see OpenAIRateLimiter.stats)",
+             [({"stat": name}, value) for name, value in _rate_limiter.stats().items()])]
+
+register_collector(_collect_rate_limiter_metrics)
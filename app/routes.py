@@ -10,10 +10,16 @@
 #     # Handle file upload logic
 #     pass
 
+import codecs
+import json
+import logging
 import os
+import time
 from datetime import datetime # Added datetime
-from flask import Blueprint, request, jsonify, current_app, g # Added g
+from flask import Blueprint, request, jsonify, current_app, g, url_for, abort, Response, stream_with_context # Added g
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
+from sqlalchemy import insert
 from app import db
 from app.models import ( # Import all needed models
     User, PracticeTest, StudentUpload, CustomQuiz,
@@ -21,13 +27,26 @@ from app.models import ( # Import all needed models
     user_skill_progress, VideoLesson, PracticeQuestion,
     PracticeAttempt, BonsaiGrowth # Added PracticeAttempt, BonsaiGrowth
 )
-from app.services import analyze_student_upload, assign_practice_questions # Added assign_practice_questions
+from app.services import assign_practice_questions # Added assign_practice_questions
+from app.jobs import enqueue_job, get_latest_job
+from app.progress import apply_progress_transitions
 from app.auth import require_api_key # Import the decorator
+from app.db_routing import read_replica
+from app.uploads import UploadNotText, store_upload
 
 # Use a Blueprint for organization
 bp = Blueprint('main', __name__, url_prefix='/api')
 
-ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif'} # Example extensions, adjust as needed
+logger = logging.getLogger(__name__)
+# Per-answer events; sampled through LOG_SAMPLE_RATES
+answer_logger = logging.getLogger(__name__ + '.answers')
+
+ALLOWED_EXTENSIONS = {'txt', 'md', 'csv'} # Text only: uploads are classified as UTF-8 text
+
+@bp.app_errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    limit = current_app.config['MAX_CONTENT_LENGTH']
+    return jsonify({"error": f"Upload too large (limit: {limit} bytes)"}), 413
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -57,53 +76,87 @@ def upload_file():
 
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename) # Sanitize filename
-        upload_folder = os.path.join(current_app.instance_path, 'uploads')
-        os.makedirs(upload_folder, exist_ok=True)
-        # Consider unique filenames to avoid overwrites
-        temp_file_path = os.path.join(upload_folder, filename)
+        temp_file_path = None
 
         try:
-            file.save(temp_file_path)
+            # Copy in chunks (constant memory) to a unique path, hashing the content on the way
+            temp_file_path, content_sha256, size_bytes = store_upload(file, filename)
             new_upload = StudentUpload(
                 student=user,
                 practice_test=practice_test,
                 temp_storage_ref=temp_file_path,
+                content_sha256=content_sha256,
+                size_bytes=size_bytes,
                 processing_status='uploaded'
             )
             db.session.add(new_upload)
-            db.session.commit()
-
-            # --- Trigger Analysis (Ideally Asynchronous) --- #
-            # In a real app, use Celery/RQ: trigger_analysis.delay(new_upload.id)
-            # For now, call directly (blocks request):
-            current_app.logger.info(f"Triggering synchronous analysis for upload {new_upload.id}")
-            analyze_student_upload(new_upload.id) # This will now also trigger quiz generation
+            db.session.flush() # Need the upload ID for the job reference
+
+            # --- Queue Analysis (runs in `flask worker`) --- #
+            enqueue_job(
+                'analyze_upload',
+                {"upload_id": new_upload.id},
+                reference=f"student_upload:{new_upload.id}",
+                commit=False
+            )
+            db.session.commit() # Upload and job are stored together
+            logger.info("Queued analysis for upload %s", new_upload.id, extra={"upload_id": new_upload.id})
             # --- End Trigger --- #
 
-            # Fetch the updated upload status after analysis/quiz gen
-            db.session.refresh(new_upload)
-
             return jsonify({
-                "message": "File uploaded and processing initiated",
+                "message": "File uploaded and queued for processing",
                 "upload_id": new_upload.id,
                 "filename": filename,
                 "status": new_upload.processing_status,
-                 "quiz_id": new_upload.custom_quiz.id if new_upload.custom_quiz else None
-            }), 201 # 201 Created
+                "status_url": url_for('main.get_upload_status', upload_id=new_upload.id)
+            }), 202 # 202 Accepted: analysis and quiz generation happen in the background
 
+        except UploadNotText as e:
+            db.session.rollback()
+            logger.info("Rejected upload %s: %s", filename, e)
+            return jsonify({"error": "File must be UTF-8 text"}), 400
         except Exception as e:
             db.session.rollback()
-            if os.path.exists(temp_file_path):
+            if temp_file_path and os.path.exists(temp_file_path):
                  try: os.remove(temp_file_path)
                  except OSError: pass # Ignore error if file couldn't be removed
-            current_app.logger.error(f"Error uploading file or triggering analysis: {e}", exc_info=True)
+            current_app.logger.error(f"Error uploading file or queuing analysis: {e}", exc_info=True)
             return jsonify({"error": "Failed to process upload"}), 500
-        # Note: temp file cleanup is handled by analyze_student_upload
+        # Note: temp file cleanup is handled by analyze_student_upload and the upload sweeper
     else:
         return jsonify({"error": "File type not allowed"}), 400
 
+@bp.route('/uploads/<int:upload_id>', methods=['GET'])
+@require_api_key # Protect
+def get_upload_status(upload_id):
+    """Reports the processing status of an upload and its quiz once generated."""
+    upload = StudentUpload.query.get_or_404(upload_id)
+    user = g.current_user
+
+    # Authorization check
+    if upload.user_id != user.id:
+        return jsonify({"error": "Forbidden: You do not own this upload"}), 403
+
+    job = get_latest_job(f"student_upload:{upload.id}", job_type='analyze_upload')
+    quiz = upload.custom_quiz
+
+    return jsonify({
+        "upload_id": upload.id,
+        "practice_test": upload.practice_test.identifier,
+        "uploaded_at": upload.upload_timestamp.isoformat(),
+        "status": upload.processing_status,
+        "quiz_id": quiz.id if quiz else None,
+        "job": {
+            "status": job.status,
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts,
+            "next_attempt_at": job.run_after.isoformat() if job.status == 'queued' and job.run_after else None
+        } if job else None
+    })
+
 @bp.route('/quizzes/<int:quiz_id>', methods=['GET'])
 @require_api_key # Protect
+@read_replica # Pure read; may be served by the replica
 def get_quiz(quiz_id):
     quiz = CustomQuiz.query.get_or_404(quiz_id)
     user = g.current_user
@@ -112,12 +165,18 @@ def get_quiz(quiz_id):
     if quiz.user_id != user.id:
         return jsonify({"error": "Forbidden: You do not own this quiz"}), 403
 
+    # One query for all questions with their skill names (no per-question skill lookups)
+    question_rows = db.session.query(QuizQuestion, Skill.name)\
+        .join(Skill, QuizQuestion.skill_id == Skill.id)\
+        .filter(QuizQuestion.custom_quiz_id == quiz.id)\
+        .order_by(QuizQuestion.id).all()
+
     questions_data = []
-    for q in quiz.questions:
+    for q, skill_name in question_rows:
         questions_data.append({
             "question_id": q.id,
             "skill_id": q.skill_id,
-            "skill_name": q.skill.name,
+            "skill_name": skill_name,
             "text": q.question_text,
             "options": q.options # Use the property that parses JSON
             # DO NOT include q.correct_option here!
@@ -156,15 +215,37 @@ def submit_quiz(quiz_id):
 
     results = {'correct': 0, 'incorrect': 0, 'videos_queued': []}
     try:
+        # Mark quiz as completed first; the conditional UPDATE also stops a
+        # concurrent duplicate submission from grading the quiz twice
+        now = datetime.utcnow()
+        claimed = db.session.execute(
+            CustomQuiz.__table__.update().
+            where(CustomQuiz.id == quiz.id).
+            where(CustomQuiz.completed_timestamp.is_(None)).
+            values(completed_timestamp=now)
+        )
+        if claimed.rowcount != 1:
+            db.session.rollback()
+            return jsonify({"error": "Quiz already submitted"}), 400
+
+        submitted = {}
         for question_id_str, selected_option in answers.items():
             try:
-                question_id = int(question_id_str)
+                submitted[int(question_id_str)] = selected_option
             except ValueError:
                 # Log this invalid input but potentially continue
                 current_app.logger.warning(f"Invalid question ID format '{question_id_str}' in submission for quiz {quiz_id}")
-                continue
 
-            question = QuizQuestion.query.filter_by(id=question_id, custom_quiz_id=quiz.id).first()
+        # Load every answered question in one IN query
+        questions = {q.id: q for q in QuizQuestion.query
+                     .filter(QuizQuestion.custom_quiz_id == quiz.id)
+                     .filter(QuizQuestion.id.in_(list(submitted)))}
+
+        attempt_rows = []
+        missed_question_ids = [] # Questions whose incorrect answer queues a video
+        status_by_skill = {} # skill_id -> new UserSkillProgress status
+        for question_id, selected_option in submitted.items():
+            question = questions.get(question_id)
             if not question:
                 # Log this - answer submitted for a non-existent/wrong question
                 current_app.logger.warning(f"Answer submitted for invalid question ID {question_id} in quiz {quiz_id}")
@@ -172,45 +253,58 @@ def submit_quiz(quiz_id):
 
             is_correct = (str(selected_option) == str(question.correct_option))
 
-            # Create attempt record
-            attempt = QuizAttempt(
-                user_id=user.id,
-                quiz_question_id=question.id,
-                submitted_answer=selected_option,
-                is_correct=is_correct
-            )
-            db.session.add(attempt)
+            # Attempt record
+            attempt_rows.append({
+                "user_id": user.id,
+                "quiz_question_id": question.id,
+                "submitted_answer": selected_option,
+                "is_correct": is_correct,
+                "attempt_timestamp": now
+            })
 
             skill_id = question.skill_id
             # Update UserSkillProgress and potentially queue video
-            status_to_set = ''
             if is_correct:
                 results['correct'] += 1
-                status_to_set = 'quiz_correct'
-                print(f"Q{question_id} (Skill {skill_id}) Correct.") # Use logging
+                status_by_skill[skill_id] = 'quiz_correct'
+                answer_logger.info("Quiz answer correct", extra={"question_id": question_id, "skill_id": skill_id})
             else:
                 results['incorrect'] += 1
-                status_to_set = 'video_queued'
-                print(f"Q{question_id} (Skill {skill_id}) Incorrect. Queuing video.") # Use logging
-                # Create VideoQueue entry
-                video_q_item = VideoQueue(
-                    user_id=user.id,
-                    skill_id=skill_id,
-                    quiz_attempt=attempt # Link attempt
-                )
-                db.session.add(video_q_item)
+                status_by_skill[skill_id] = 'video_queued'
+                answer_logger.info("Quiz answer incorrect; queuing video", extra={"question_id": question_id, "skill_id": skill_id})
+                missed_question_ids.append(question_id)
                 results['videos_queued'].append(skill_id)
 
-            # Update user_skill_progress status for this user and skill
-            stmt = user_skill_progress.update().\
-                where(user_skill_progress.c.user_id == user.id).\
-                where(user_skill_progress.c.skill_id == skill_id).\
-                values(status=status_to_set, last_updated=datetime.utcnow())
-            db.session.execute(stmt)
-            print(f"Updated UserSkillProgress for User {user.id}, Skill {skill_id} to '{status_to_set}'")
+        if attempt_rows:
+            # Bulk insert (one executemany, no per-row RETURNING)
+            db.session.execute(insert(QuizAttempt), attempt_rows)
+
+        if missed_question_ids:
+            # Fetch the new attempt IDs in one query to link the VideoQueue entries
+            attempt_ids = dict(db.session.query(QuizAttempt.quiz_question_id, QuizAttempt.id)
+                               .filter(QuizAttempt.user_id == user.id)
+                               .filter(QuizAttempt.quiz_question_id.in_(missed_question_ids))
+                               .order_by(QuizAttempt.id)) # Latest attempt wins
+            db.session.execute(insert(VideoQueue), [{
+                "user_id": user.id,
+                "skill_id": questions[question_id].skill_id,
+                "quiz_attempt_id": attempt_ids[question_id],
+                "status": 'queued',
+                "queue_timestamp": now
+            } for question_id in missed_question_ids])
+            results['video_streams'] = [{
+                "skill_id": skill_id,
+                "queue_item_id": queue_item_id,
+                "stream_url": url_for('main.stream_video', queue_item_id=queue_item_id)
+            } for queue_item_id, skill_id in db.session.query(VideoQueue.id, VideoQueue.skill_id)
+                .filter(VideoQueue.quiz_attempt_id.in_(list(attempt_ids.values())))
+                .order_by(VideoQueue.id)]
+
+        # Update user_skill_progress for all answered skills in one statement
+        if status_by_skill:
+            apply_progress_transitions([(user.id, skill_id, status) for skill_id, status in status_by_skill.items()])
+            logger.info("Quiz %s submitted: %d correct, %d incorrect", quiz_id, results['correct'], results['incorrect'], extra={"user_id": user.id})
 
-        # Mark quiz as completed
-        quiz.completed_timestamp = datetime.utcnow()
         db.session.commit()
 
         return jsonify({
@@ -224,6 +318,140 @@ def submit_quiz(quiz_id):
         current_app.logger.error(f"Error submitting quiz {quiz_id}: {e}", exc_info=True)
         return jsonify({"error": "Failed to submit quiz results"}), 500
 
+@bp.route('/videos/queue/<int:queue_item_id>/stream', methods=['GET'])
+@require_api_key # Protect
+def stream_video(queue_item_id):
+    """Streams a queued video's script as server-sent events while it is generated.
+
+    A connection lasts at most VIDEO_STREAM_MAX_SECONDS; it then sends
+    `reconnect` and closes. Script events carry an `id` (file and byte
+    offset); a client that reconnects with it in the Last-Event-ID header
+    (EventSource does this on its own) or the `last_event_id` query
+    parameter continues where it left off.
+
+    Events:
+        status: {"status", "script_bytes"} whenever the queue item's status changes
+        script: {"text"} for each new piece of the script
+        reset: {} if generation restarted (discard text received so far)
+        done: {"video_id", "video_ref"} once the lesson is delivered
+        error: {"error"} if generation failed
+        reconnect: {"last_event_id"} before the server closes the connection
+    """
+    queue_item = VideoQueue.query.get_or_404(queue_item_id)
+    user = g.current_user
+
+    # Authorization check
+    if queue_item.user_id != user.id:
+        return jsonify({"error": "Forbidden: You do not own this video"}), 403
+
+    config = current_app.config
+    min_poll_interval = config['VIDEO_STREAM_POLL_INTERVAL_SECONDS']
+    max_poll_interval = max(config['VIDEO_STREAM_MAX_POLL_INTERVAL_SECONDS'], min_poll_interval)
+    keepalive = config['VIDEO_STREAM_KEEPALIVE_SECONDS']
+    deadline = time.monotonic() + config['VIDEO_STREAM_MAX_SECONDS']
+    resume = _parse_stream_position(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+
+    def sse(event, data, event_id=None):
+        return (f"id: {event_id}\n" if event_id else "") + f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def events():
+        nonlocal resume
+        reader_path, reader, decoder = None, None, None
+        offset = 0 # Bytes of reader_path sent so far
+        last_event_id = None
+        last_status = None
+        last_sent = time.monotonic()
+        poll_interval = min_poll_interval
+        yield f"retry: {config['VIDEO_STREAM_RETRY_MS']}\n\n"
+        try:
+            while True:
+                status, stream_path, script_bytes = db.session.query(
+                    VideoQueue.status, VideoQueue.script_stream_path, VideoQueue.script_bytes
+                ).filter(VideoQueue.id == queue_item_id).one()
+                lesson = None
+                if status == 'delivered':
+                    lesson = db.session.query(VideoLesson.id, VideoLesson.video_ref)\
+                        .filter(VideoLesson.video_queue_id == queue_item_id).first()
+                db.session.rollback() # End the read transaction so the next poll sees new commits
+                progressed = False
+
+                if status != last_status:
+                    yield sse('status', {"status": status, "script_bytes": script_bytes or 0})
+                    last_status = status
+                    last_sent = time.monotonic()
+                    progressed = True
+
+                # The worker writes to a partial file and moves it to video_ref when
+                # done; an open handle keeps reading the same file across the move
+                path = stream_path if status == 'generating' else None
+                if status == 'delivered' and reader is None and lesson:
+                    path = lesson.video_ref
+                if path and path != reader_path and (reader is None or status == 'generating'):
+                    if reader is not None:
+                        reader.close()
+                        reader = None
+                        yield sse('reset', {})
+                    try:
+                        reader = open(path, 'rb')
+                        reader_path = path
+                        decoder = codecs.getincrementaldecoder('utf-8')()
+                        offset = 0
+                        if resume is not None:
+                            if resume[0] == os.path.basename(path):
+                                reader.seek(resume[1])
+                                offset = resume[1]
+                            else:
+                                yield sse('reset', {}) # The client's text came from another (restarted) stream
+                            resume = None
+                    except FileNotFoundError:
+                        pass # Already moved into place; picked up once delivered
+
+                if reader is not None:
+                    chunk = reader.read()
+                    offset += len(chunk)
+                    text = decoder.decode(chunk, final=(status == 'delivered'))
+                    if text:
+                        # Bytes of an incomplete character are resent after a reconnect
+                        last_event_id = f"{os.path.basename(reader_path)}:{offset - len(decoder.getstate()[0])}"
+                        yield sse('script', {"text": text}, last_event_id)
+                        last_sent = time.monotonic()
+                        progressed = True
+
+                if status == 'delivered':
+                    yield sse('done', {
+                        "video_id": lesson.id if lesson else None,
+                        "video_ref": lesson.video_ref if lesson else None
+                    })
+                    return
+                if status == 'error':
+                    yield sse('error', {"error": "Video generation failed"})
+                    return
+                if time.monotonic() > deadline:
+                    # Frees the request thread; generation goes on and the client resumes
+                    yield sse('reconnect', {"last_event_id": last_event_id})
+                    return
+                if time.monotonic() - last_sent >= keepalive:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+                # Back off while nothing changes (e.g., queued behind other videos)
+                poll_interval = min_poll_interval if progressed else min(poll_interval * 2, max_poll_interval)
+                time.sleep(poll_interval)
+        finally:
+            if reader is not None:
+                reader.close()
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no" # Disable proxy buffering (e.g., nginx)
+    })
+
+def _parse_stream_position(last_event_id):
+    """Splits a stream_video event ID into (file name, byte offset); None if absent or malformed."""
+    name, _, offset = (last_event_id or '').rpartition(':')
+    if not name or not offset.isdigit():
+        return None
+    return name, int(offset)
+
 @bp.route('/videos/<int:video_id>/watched', methods=['POST'])
 @require_api_key # Protect
 def mark_video_watched(video_id):
@@ -240,17 +468,13 @@ def mark_video_watched(video_id):
         # Update UserSkillProgress status
         skill_id = video_lesson.skill_id
         status_to_set = 'video_watched'
-        stmt = user_skill_progress.update().\
-            where(user_skill_progress.c.user_id == user.id).\
-            where(user_skill_progress.c.skill_id == skill_id).\
-            values(status=status_to_set, last_updated=datetime.utcnow())
-        db.session.execute(stmt)
+        apply_progress_transitions([(user.id, skill_id, status_to_set)])
 
         db.session.commit()
-        print(f"Video {video_id} marked watched for User {user.id}. UserSkillProgress updated to '{status_to_set}'")
+        logger.info("Video %s marked watched", video_id, extra={"user_id": user.id})
 
         # --- Trigger Practice Question Assignment (Ideally Asynchronous) --- #
-        print(f"Triggering practice question assignment for video {video_id}...")
+        logger.debug("Triggering practice question assignment for video %s", video_id)
         assign_practice_questions(video_lesson.id)
         # --- End Trigger --- #
 
@@ -266,22 +490,36 @@ def mark_video_watched(video_id):
 
 @bp.route('/videos/<int:video_id>/practice', methods=['GET'])
 @require_api_key # Protect
+@read_replica # Pure read; may be served by the replica
 def get_practice_questions(video_id):
     """Fetches the practice questions associated with a video lesson."""
-    video_lesson = VideoLesson.query.get_or_404(video_id)
     user = g.current_user # Use authenticated user
 
+    # Lesson, owner and skill name in one query
+    lesson_row = db.session.query(VideoLesson.skill_id, VideoQueue.user_id, Skill.name)\
+        .outerjoin(VideoQueue, VideoLesson.video_queue_id == VideoQueue.id)\
+        .join(Skill, VideoLesson.skill_id == Skill.id)\
+        .filter(VideoLesson.id == video_id).first()
+    if lesson_row is None:
+        abort(404)
+    lesson_skill_id, owner_id, lesson_skill_name = lesson_row
+
     # Authorization check
-    queue_item = video_lesson.queue_item
-    if not queue_item or queue_item.user_id != user.id:
+    if owner_id != user.id:
          return jsonify({"error": "Forbidden: You cannot view these practice questions"}), 403
 
+    # One query for all questions with their skill names (no per-question skill lookups)
+    question_rows = db.session.query(PracticeQuestion, Skill.name)\
+        .join(Skill, PracticeQuestion.skill_id == Skill.id)\
+        .filter(PracticeQuestion.video_lesson_id == video_id)\
+        .order_by(PracticeQuestion.id).all()
+
     questions_data = []
-    for q in video_lesson.practice_questions: # Uses the relationship
+    for q, skill_name in question_rows:
         questions_data.append({
             "question_id": q.id,
             "skill_id": q.skill_id,
-            "skill_name": q.skill.name,
+            "skill_name": skill_name,
             "text": q.question_text,
             "options": q.options
             # Do not include correct_option
@@ -289,8 +527,8 @@ def get_practice_questions(video_id):
 
     return jsonify({
         "video_id": video_id,
-        "skill_id": video_lesson.skill_id,
-        "skill_name": video_lesson.skill.name,
+        "skill_id": lesson_skill_id,
+        "skill_name": lesson_skill_name,
         "questions": questions_data
     })
 
@@ -362,12 +600,16 @@ def submit_practice_questions(video_id):
                 results['incorrect'] += 1
                 all_correct = False
 
-        # Update UserSkillProgress and Bonsai Tree if all answers were correct
-        status_to_set = ''
-        if all_correct:
-            status_to_set = 'mastered' # Or 'practice_completed' etc.
+        # Update UserSkillProgress, then the Bonsai Tree if the skill was mastered
+        status_to_set = 'mastered' if all_correct else 'practice_failed'
+        written = apply_progress_transitions([(user.id, skill_id, status_to_set)])
+        results['progress_updated'] = (user.id, skill_id) in written
+        if not results['progress_updated']:
+            # E.g., a newer upload flagged the skill as missed again; the attempts are still recorded
+            logger.info("Practice for skill %s did not change its progress", skill_id, extra={"user_id": user.id})
+        elif all_correct:
             results['tree_grew'] = True
-            print(f"Practice for Skill {skill_id} completed successfully by User {user.id}. Growing tree.")
+            logger.info("Practice for skill %s completed successfully; growing tree", skill_id, extra={"user_id": user.id})
 
             # Find or create BonsaiGrowth record
             bonsai = user.bonsai_growth
@@ -377,17 +619,7 @@ def submit_practice_questions(video_id):
             bonsai.branch_count += 1
             bonsai.last_growth_timestamp = datetime.utcnow()
         else:
-            # Decide status if practice failed (e.g., 'practice_failed', keep as 'video_watched'?
-            status_to_set = 'practice_failed'
-            print(f"Practice for Skill {skill_id} completed with errors by User {user.id}.")
-
-        # Update user_skill_progress status
-        stmt = user_skill_progress.update().\
-            where(user_skill_progress.c.user_id == user.id).\
-            where(user_skill_progress.c.skill_id == skill_id).\
-            values(status=status_to_set, last_updated=datetime.utcnow())
-        db.session.execute(stmt)
-        print(f"Updated UserSkillProgress for User {user.id}, Skill {skill_id} to '{status_to_set}'")
+            logger.info("Practice for skill %s completed with errors", skill_id, extra={"user_id": user.id})
 
         db.session.commit()
 
@@ -405,6 +637,7 @@ def submit_practice_questions(video_id):
 
 @bp.route('/users/<int:user_id>/progress', methods=['GET'])
 @require_api_key # Protect
+@read_replica # Pure read; may be served by the replica
 def get_user_progress(user_id):
     """Fetches the skill progress status for a user."""
     requesting_user = g.current_user # User making the request
@@ -437,6 +670,7 @@ def get_user_progress(user_id):
 
 @bp.route('/users/<int:user_id>/bonsai', methods=['GET'])
 @require_api_key # Protect
+@read_replica # Pure read; may be served by the replica
 def get_bonsai_status(user_id):
     """Fetches the bonsai tree growth status for a user."""
     requesting_user = g.current_user
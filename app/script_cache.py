@@ -0,0 +1,270 @@
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import VideoScriptCache, VideoLesson, VideoQueue
+from app import ai_service
+
+def video_script_cache_key(skill_name, skill_category, prompt_version, model):
+    """Returns the cache key for scripts of a skill generated with a prompt version and model."""
+    raw = "\x1f".join([skill_name, skill_category or "", prompt_version, model])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def get_video_script(skill, queue_item_id=None):
+    """Returns the path of a video script for the skill, generating one only when needed.
+
+    Up to VIDEO_SCRIPT_VARIANTS distinct scripts are kept per (skill, prompt
+    version, model). Until the pool is full every call generates a new variant;
+    after that the least recently used variant is reused, so students see
+    different scripts without paying for a generation each time.
+
+    When a queue item is given and VIDEO_SCRIPT_STREAMING is on, a new script
+    is streamed to a partial file recorded on the VideoQueue row, so the SSE
+    endpoint can relay it while it is being generated.
+
+    Args:
+        skill (Skill): The skill to teach
+        queue_item_id (int): VideoQueue item to report streaming progress on
+
+    Returns:
+        str: Path of the shared script file (stored as VideoLesson.video_ref)
+    """
+    config = current_app.config
+    model = config['OPENAI_MODEL']
+    prompt_version = ai_service.VIDEO_SCRIPT_PROMPT_VERSION
+    cache_key = video_script_cache_key(skill.name, skill.category, prompt_version, model)
+    cutoff = datetime.utcnow() - timedelta(seconds=config['VIDEO_SCRIPT_CACHE_TTL_SECONDS'])
+
+    entries = [entry for entry in VideoScriptCache.query
+               .filter(VideoScriptCache.cache_key == cache_key)
+               .filter(VideoScriptCache.created_at >= cutoff)
+               .all()
+               if os.path.exists(entry.script_path)]
+
+    if len(entries) < config['VIDEO_SCRIPT_VARIANTS']:
+        if queue_item_id is not None and config['VIDEO_SCRIPT_STREAMING']:
+            content_sha256, script_path, cacheable = _stream_script_shared(skill, queue_item_id)
+        else:
+            script = ai_service.generate_video_script(skill.name, skill.category)
+            content_sha256, script_path = _store_script(script)
+            cacheable = not ai_service.is_fallback_video_script(script, skill.name)
+        if not cacheable:
+            return script_path # Never cache placeholder scripts
+
+        # Concurrent callers can share one generation (see single_flight), so the
+        # same script may already have been stored since the lookup above
+        entry = VideoScriptCache.query.filter_by(cache_key=cache_key, content_sha256=content_sha256).first()
+        if entry is None:
+            try:
+                with db.session.begin_nested():
+                    entry = VideoScriptCache(
+                        cache_key=cache_key,
+                        skill_id=skill.id,
+                        prompt_version=prompt_version,
+                        model=model,
+                        content_sha256=content_sha256,
+                        script_path=script_path,
+                        use_count=0
+                    )
+                    db.session.add(entry)
+                current_app.logger.info(f"Cached video script variant {len(entries) + 1}/{config['VIDEO_SCRIPT_VARIANTS']} for skill '{skill.name}'")
+            except IntegrityError:
+                entry = VideoScriptCache.query.filter_by(cache_key=cache_key, content_sha256=content_sha256).one()
+    else:
+        entry = min(entries, key=lambda e: e.last_used_at) # Rotate through the variants
+        current_app.logger.info(f"Video script cache hit for skill '{skill.name}'")
+
+    entry.last_used_at = datetime.utcnow()
+    entry.use_count = (entry.use_count or 0) + 1
+    db.session.commit()
+
+    evict_video_scripts()
+    return entry.script_path
+
+def evict_video_scripts():
+    """Removes expired cache entries and the least recently used ones beyond
+    VIDEO_SCRIPT_CACHE_MAX_ENTRIES. Script files still referenced by a
+    VideoLesson are kept on disk.
+
+    Returns:
+        int: Number of cache entries removed
+    """
+    config = current_app.config
+    cutoff = datetime.utcnow() - timedelta(seconds=config['VIDEO_SCRIPT_CACHE_TTL_SECONDS'])
+
+    evicted = VideoScriptCache.query.filter(VideoScriptCache.created_at < cutoff).all()
+    overflow = VideoScriptCache.query.count() - len(evicted) - config['VIDEO_SCRIPT_CACHE_MAX_ENTRIES']
+    if overflow > 0:
+        evicted += VideoScriptCache.query.filter(VideoScriptCache.created_at >= cutoff)\
+            .order_by(VideoScriptCache.last_used_at).limit(overflow).all()
+    if not evicted:
+        return 0
+
+    paths = {entry.script_path for entry in evicted}
+    for entry in evicted:
+        db.session.delete(entry)
+    db.session.flush()
+
+    referenced = {path for (path,) in db.session.query(VideoLesson.video_ref).filter(VideoLesson.video_ref.in_(paths))}
+    referenced |= {path for (path,) in db.session.query(VideoScriptCache.script_path).filter(VideoScriptCache.script_path.in_(paths))}
+    db.session.commit()
+
+    for path in paths - referenced:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    current_app.logger.info(f"Evicted {len(evicted)} video script cache entries")
+    return len(evicted)
+
+def _stream_script_shared(skill, queue_item_id):
+    """Streams a new script, sharing one generation between concurrent callers.
+
+    Like single_flight, callers for the same skill coordinate through a
+    GenerationLease: the leader streams and publishes its partial file on the
+    lease, and the others point their queue items at that file (so their SSE
+    clients relay the same text live) until the leader stores the script.
+    If the leader fails, a waiting caller takes the lease and streams itself.
+
+    Returns:
+        tuple: (content sha256, script path, cacheable)
+    """
+    config = current_app.config
+    if not config['SINGLE_FLIGHT_ENABLED']:
+        return _stream_and_store(skill, queue_item_id)
+
+    key = ai_service.generation_lease_key('stream_video_script', ai_service.VIDEO_SCRIPT_PROMPT_VERSION,
+                                          [skill.name, skill.category], {})
+    holder = ai_service.lease_holder()
+    waiting = False
+    followed_path = None
+    last_progress = time.monotonic()
+    while True:
+        acquired, result, leader = ai_service.acquire_lease(key, holder, waiting)
+        if acquired:
+            break
+        if result is not None:
+            current_app.logger.info(f"Followed the script stream of {leader} for skill '{skill.name}'")
+            return result["content_sha256"], result["script_path"], True
+        waiting = True
+
+        progress = ai_service.get_lease_progress(key)
+        partial_path = progress and progress.get("partial_path")
+        if partial_path and partial_path != followed_path:
+            _record_stream_progress(queue_item_id, script_stream_path=partial_path, script_bytes=0)
+            followed_path = partial_path
+            last_progress = time.monotonic()
+        elif followed_path and time.monotonic() - last_progress >= config['VIDEO_STREAM_PROGRESS_INTERVAL_SECONDS']:
+            try:
+                _record_stream_progress(queue_item_id, script_bytes=os.path.getsize(followed_path))
+            except OSError:
+                pass # Moved into place; the result arrives with the next poll
+            last_progress = time.monotonic()
+        time.sleep(config['SINGLE_FLIGHT_POLL_INTERVAL_SECONDS'])
+
+    try:
+        content_sha256, script_path, cacheable = _stream_and_store(
+            skill, queue_item_id,
+            on_start=lambda partial_path: ai_service.set_lease_progress(key, holder, {"partial_path": partial_path})
+        )
+    except BaseException:
+        ai_service.release_lease(key, holder) # Let a waiting caller stream instead
+        raise
+    if cacheable:
+        ai_service.complete_lease(key, holder, {"content_sha256": content_sha256, "script_path": script_path})
+    else:
+        ai_service.release_lease(key, holder)
+    return content_sha256, script_path, cacheable
+
+def _stream_and_store(skill, queue_item_id, on_start=None):
+    """Streams a new script and moves it into place.
+
+    Returns:
+        tuple: (content sha256, script path, cacheable)
+    """
+    script, partial_path = _stream_script(skill, queue_item_id, on_start)
+    content_sha256, script_path = _store_script(script, partial_path=partial_path)
+    return content_sha256, script_path, not ai_service.is_fallback_video_script(script, skill.name)
+
+def _stream_script(skill, queue_item_id, on_start=None):
+    """Streams a new script to a partial file, recording progress on the queue item.
+
+    on_start(partial_path) is called once the file exists. Progress (bytes
+    written) is committed at most every
+    VIDEO_STREAM_PROGRESS_INTERVAL_SECONDS; the file itself is flushed after
+    every chunk so readers can tail it.
+
+    Returns:
+        tuple: (script, partial file path)
+    """
+    config = current_app.config
+    stream_dir = os.path.join(current_app.instance_path, 'videos', 'streams')
+    os.makedirs(stream_dir, exist_ok=True)
+    # A unique name per attempt, so a requeued item never reuses a file a reader still has open
+    partial_path = os.path.join(stream_dir, f"{queue_item_id}-{uuid.uuid4().hex}.part")
+    _record_stream_progress(queue_item_id, script_stream_path=partial_path, script_bytes=0)
+
+    chunks = []
+    written = 0
+    last_progress = time.monotonic()
+    try:
+        with open(partial_path, 'w', encoding='utf-8', newline='') as f:
+            if on_start is not None:
+                on_start(partial_path)
+            for chunk in ai_service.stream_video_script(skill.name, skill.category):
+                f.write(chunk)
+                f.flush()
+                chunks.append(chunk)
+                written += len(chunk.encode('utf-8'))
+                if time.monotonic() - last_progress >= config['VIDEO_STREAM_PROGRESS_INTERVAL_SECONDS']:
+                    _record_stream_progress(queue_item_id, script_bytes=written)
+                    last_progress = time.monotonic()
+    except BaseException:
+        _remove_file(partial_path)
+        raise
+    _record_stream_progress(queue_item_id, script_bytes=written)
+    return "".join(chunks), partial_path
+
+def _record_stream_progress(queue_item_id, **values):
+    db.session.execute(
+        VideoQueue.__table__.update().
+        where(VideoQueue.id == queue_item_id).
+        values(progress_updated_at=datetime.utcnow(), **values)
+    )
+    db.session.commit()
+
+def _store_script(script, partial_path=None):
+    """Writes a script under its content hash and returns (sha256, path).
+
+    A streamed script is moved into place from its partial file instead of
+    being written again.
+    """
+    content = script.encode('utf-8')
+    content_sha256 = hashlib.sha256(content).hexdigest()
+    script_dir = os.path.join(current_app.instance_path, 'videos', 'scripts')
+    os.makedirs(script_dir, exist_ok=True)
+    script_path = os.path.join(script_dir, f"{content_sha256}.txt")
+
+    if os.path.exists(script_path):
+        if partial_path:
+            _remove_file(partial_path)
+    elif partial_path:
+        os.replace(partial_path, script_path)
+    else:
+        # Write to a temporary file and rename so readers never see a partial script
+        fd, tmp_path = tempfile.mkstemp(dir=script_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, script_path)
+    return content_sha256, script_path
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
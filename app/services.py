@@ -22,197 +22,299 @@
 
 # Add other service functions (video generation, practice question generation, etc.) 
 
+import logging
 import os
+import threading
 import time # For simulating processing time
+from contextlib import contextmanager
 from datetime import datetime # Added missing import
+from itertools import islice
+from flask import has_app_context, current_app
+from sqlalchemy import insert
 from app import db, create_app # Import create_app for context
-from app.models import StudentUpload, Skill, MissedSkill, user_skill_progress, CustomQuiz, QuizQuestion, VideoQueue, VideoLesson, PracticeQuestion # Import necessary models
-from app.ai_service import classify_missed_skills, generate_quiz_question, generate_video_script, generate_practice_questions
+from app.models import StudentUpload, MissedSkill, CustomQuiz, QuizQuestion, VideoQueue, VideoLesson, PracticeQuestion # Import necessary models
+from app.ai_service import is_fallback_classification, generate_quiz_question, generate_practice_questions
+from app.classification_cache import get_cached_skills, store_skills, classify_content
+from app.script_cache import get_video_script
+from app.question_bank import take_questions, new_claim_token, release_questions
+from app.jobs import register_job_handler
+from app.skills import resolve_skill_ids
+from app.progress import apply_progress_transitions
+from app.uploads import iter_text_windows
+from app.metrics import stage_timer, observe_stage
+from app.logs import log_context
+from app.utils import run_concurrently
+
+logger = logging.getLogger(__name__)
+# Per-question events; sampled through LOG_SAMPLE_RATES
+question_logger = logging.getLogger(__name__ + '.questions')
+
+# Single app reused by every service call made outside an app context (e.g., scripts)
+_service_app = None
+_service_app_lock = threading.Lock()
+
+@contextmanager
+def service_app_context():
+    """Runs service code in the current app context, or in a shared one.
+
+    Inside a request or the job worker the existing context (and its engine and
+    session) is reused. Outside of one, a single process-wide app is created
+    on first use instead of building a new app and engine for every call.
+    """
+    if has_app_context():
+        yield
+        return
+
+    global _service_app
+    with _service_app_lock:
+        if _service_app is None:
+            _service_app = create_app()
+    with _service_app.app_context():
+        yield
 
 def analyze_student_upload(upload_id):
     """Analyzes an upload, identifies skills using AI, and updates DB."""
-    app = create_app() # Create app instance for context
-    with app.app_context(): # Need app context for DB operations
+    with service_app_context(), log_context(upload_id=upload_id): # Need app context for DB operations
         upload = StudentUpload.query.get(upload_id)
         if not upload:
-            print(f"Error: Upload ID {upload_id} not found.") # Use proper logging later
+            logger.error("Upload %s not found", upload_id)
             return
 
-        if upload.processing_status not in ['uploaded', 'error']: # Prevent re-processing
-            print(f"Info: Upload ID {upload_id} already processed or in progress.")
+        # 'processing' is left behind when a worker died mid-analysis; the job queue
+        # runs one attempt at a time, so seeing it here means that attempt was requeued
+        if upload.processing_status not in ['uploaded', 'error', 'processing']: # Prevent re-processing
+            logger.info("Upload %s already processed or in progress", upload_id)
             return
 
         user = upload.student
         temp_file_path = upload.temp_storage_ref
 
         try:
-            print(f"Starting analysis for upload {upload_id} (User: {user.username})...")
+            logger.info("Starting analysis for upload %s", upload_id, extra={"user_id": user.id})
             upload.processing_status = 'processing'
             db.session.commit()
 
             # --- AI Analysis --- #
-            # 1. Read the file
-            print(f"Reading file: {temp_file_path}")
-            if not os.path.exists(temp_file_path):
-                raise FileNotFoundError(f"Temporary file not found: {temp_file_path}")
-            
-            with open(temp_file_path, 'r') as f:
-                content = f.read()
-            
-            # 2. Identify missed skills using AI
-            # In a real production environment, add more error handling and retry logic
-            identified_skills = classify_missed_skills(content)
-            print(f"AI identified {len(identified_skills)} skills: {identified_skills}")
+            # 1. Reuse the skills of an identical earlier upload of the same test
+            identified_skills = get_cached_skills(upload)
+            if identified_skills is None:
+                # 2. Check the file
+                logger.debug("Reading file %s", temp_file_path)
+                if not os.path.exists(temp_file_path):
+                    raise FileNotFoundError(f"Temporary file not found: {temp_file_path}")
+
+                # 3. Identify missed skills using AI, one bounded window of the file at a time
+                identified_skills, complete = classify_upload_file(temp_file_path)
+                if complete:
+                    store_skills(upload, identified_skills) # Never cache placeholder results
+                logger.info("AI identified %d skill(s)", len(identified_skills))
+                logger.debug("Identified skills", extra={"skills": [skill.get("name") for skill in identified_skills]})
             # --- End AI Analysis --- #
 
-            # 3. Update Database
-            missed_skills_added = []
-            for skill_data in identified_skills:
-                skill_name = skill_data.get('name')
-                skill_category = skill_data.get('category')
-                
-                if not skill_name:
-                    continue  # Skip entries without a name
-                
-                skill = Skill.query.filter_by(name=skill_name).first()
-                if not skill:
-                    # Create skill if it doesn't exist
-                    print(f"Skill '{skill_name}' not found. Creating...")
-                    skill = Skill(
-                        name=skill_name, 
-                        category=skill_category or "Uncategorized"  # Default if category missing
-                    )
-                    db.session.add(skill)
-                    db.session.flush() # Assigns ID without full commit
-
-                # Create MissedSkill log entry
-                missed_skill_log = MissedSkill(user_id=user.id, student_upload_id=upload.id, skill_id=skill.id)
-                db.session.add(missed_skill_log)
-                missed_skills_added.append(skill)
-
-                # Update UserSkillProgress (add skill to user's progress if not already tracked)
-                if skill not in user.skills_progress:
-                    user.skills_progress.append(skill)
-                    print(f"Added '{skill.name}' to User {user.id}'s progress (status: missed).")
-                else:
-                    # If already tracked, ensure status reflects 'missed' again
-                    stmt = user_skill_progress.update().\
-                        where(user_skill_progress.c.user_id == user.id).\
-                        where(user_skill_progress.c.skill_id == skill.id).\
-                        values(status='missed', last_updated=datetime.utcnow())
-                    db.session.execute(stmt)
-                    print(f"Updated User {user.id}'s progress for '{skill.name}' to status: missed.")
+            # 4. Update Database
+            # Resolve every returned name to a canonical skill in one batch
+            with stage_timer('skill_resolve'):
+                skill_ids = resolve_skill_ids(identified_skills)
+            if skill_ids:
+                with stage_timer('progress_update'):
+                    # MissedSkill log entries
+                    db.session.execute(insert(MissedSkill), [
+                        {"user_id": user.id, "student_upload_id": upload.id, "skill_id": skill_id, "identified_timestamp": datetime.utcnow()}
+                        for skill_id in skill_ids
+                    ])
+
+                    # Update UserSkillProgress: track new skills, reset tracked ones to 'missed'
+                    apply_progress_transitions([(user.id, skill_id, 'missed') for skill_id in skill_ids])
+                logger.debug("Set progress to 'missed' for %d skill(s)", len(skill_ids), extra={"user_id": user.id})
 
             upload.processing_status = 'complete'
-            db.session.commit()
-            print(f"Analysis complete for upload {upload_id}.")
+            with stage_timer('commit'):
+                db.session.commit()
+            logger.info("Analysis complete for upload %s", upload_id)
 
             # --- Trigger Quiz Generation --- #
-            print(f"Triggering quiz generation for upload {upload_id}...")
-            generate_custom_quiz(upload_id)
+            logger.debug("Triggering quiz generation for upload %s", upload_id)
+            with stage_timer('quiz_generate'):
+                generate_custom_quiz(upload_id)
             # --- End Trigger --- #
 
         except Exception as e:
             db.session.rollback()
             upload.processing_status = 'error'
             db.session.commit()
-            print(f"Error during analysis for upload {upload_id}: {e}") # Use proper logging
-
-        finally:
-            # 4. Clean up temporary file (regardless of success/failure)
-            if os.path.exists(temp_file_path):
-                try:
-                    os.remove(temp_file_path)
-                    print(f"Removed temporary file: {temp_file_path}")
-                except OSError as e:
-                    print(f"Error removing temporary file {temp_file_path}: {e}") # Log this error
+            logger.error("Error during analysis for upload %s: %s", upload_id, e)
+            raise # Let the job queue retry; the temp file is kept for the next attempt
+
+        # 4. Clean up temporary file once analysis succeeded
+        _remove_temp_file(temp_file_path)
+
+def classify_upload_file(path):
+    """Classifies missed skills in an uploaded file of any size.
+
+    The file is read in chunks and split into windows of at most
+    CLASSIFY_WINDOW_CHARS, so no prompt exceeds the model context. Up to
+    AI_MAX_CONCURRENCY windows are held in memory and classified at a time
+    (through the classification cache, see app/classification_cache.py); the
+    skill lists are merged, dropping duplicates by name.
+
+    Args:
+        path (str): Path of the uploaded file
+
+    Returns:
+        tuple: (unique skill dicts ('name', 'category') in first-seen order,
+            False if any window fell back to the placeholder skill list)
+    """
+    config = current_app.config
+    windows = iter_text_windows(path, config['CLASSIFY_WINDOW_CHARS'], config['UPLOAD_CHUNK_SIZE_BYTES'])
+    merged = {} # lowercased name -> skill dict
+    window_count = 0
+    complete = True
+    read_seconds = classify_seconds = 0.0
+    while True:
+        started = time.perf_counter()
+        batch = [(window,) for window in islice(windows, config['AI_MAX_CONCURRENCY'])]
+        read_seconds += time.perf_counter() - started
+        if not batch:
+            break
+        window_count += len(batch)
+        started = time.perf_counter()
+        results = run_concurrently(classify_content, batch)
+        classify_seconds += time.perf_counter() - started
+        for skills in results:
+            complete = complete and not is_fallback_classification(skills)
+            for skill_data in skills:
+                name = (skill_data.get('name') or '').strip()
+                if name and name.lower() not in merged:
+                    merged[name.lower()] = dict(skill_data, name=name)
+    observe_stage('file_read', read_seconds)
+    observe_stage('classify', classify_seconds)
+    if window_count > 1:
+        logger.info("Classified %d windows of %s", window_count, path)
+    return list(merged.values()), complete
+
+def _remove_temp_file(temp_file_path):
+    if temp_file_path and os.path.exists(temp_file_path):
+        try:
+            os.remove(temp_file_path)
+            logger.debug("Removed temporary file %s", temp_file_path)
+        except OSError as e:
+            logger.warning("Error removing temporary file %s: %s", temp_file_path, e)
+
+def discard_upload_file(upload_id):
+    """Removes the temporary file of an upload whose analysis job gave up."""
+    upload = db.session.get(StudentUpload, upload_id)
+    if upload:
+        if upload.processing_status == 'processing': # The last attempt's worker died mid-analysis
+            upload.processing_status = 'error'
+            db.session.commit()
+        _remove_temp_file(upload.temp_storage_ref)
 
 def generate_custom_quiz(upload_id):
     """Generates a custom quiz based on missed skills from an upload using AI."""
-    app = create_app()
-    with app.app_context():
+    with service_app_context(), log_context(upload_id=upload_id):
         upload = StudentUpload.query.get(upload_id)
         if not upload:
-            print(f"Error: Upload ID {upload_id} not found for quiz generation.")
+            logger.error("Upload %s not found for quiz generation", upload_id)
             return None
 
         if upload.processing_status != 'complete':
-            print(f"Error: Analysis not complete for upload {upload_id}. Cannot generate quiz.")
+            logger.error("Analysis not complete for upload %s; cannot generate quiz", upload_id)
             return None
 
         if upload.custom_quiz: # Check if quiz already exists for this upload
-            print(f"Info: Custom quiz already exists for upload {upload_id}.")
+            logger.info("Custom quiz already exists for upload %s", upload_id)
             return upload.custom_quiz
 
         user = upload.student
         missed_skills = MissedSkill.query.filter_by(student_upload_id=upload.id).all()
 
         if not missed_skills:
-            print(f"Info: No missed skills found for upload {upload_id}. No quiz needed.")
+            logger.info("No missed skills found for upload %s; no quiz needed", upload_id)
             return None
 
+        claim_token = new_claim_token()
         try:
-            print(f"Generating custom quiz for upload {upload_id} (User: {user.username})...")
-            # Create the CustomQuiz record
+            logger.info("Generating custom quiz for upload %s", upload_id, extra={"user_id": user.id})
+
+            skills = [missed_skill_log.skill for missed_skill_log in missed_skills]
+
+            # Take pre-generated questions from the question bank first
+            banked = take_questions({skill.id: 1 for skill in skills}, claim_token=claim_token)
+            questions_by_skill = {skill_id: questions[0] for skill_id, questions in banked.items() if questions}
+
+            # --- AI Question Generation --- #
+            # Only bank misses are generated, concurrently (bounded by AI_MAX_CONCURRENCY);
+            # the worker threads only call the AI service and never touch the session.
+            misses = [skill for skill in skills if skill.id not in questions_by_skill]
+            logger.debug("Generating AI questions for %d of %d skills", len(misses), len(skills))
+            generated = run_concurrently(
+                generate_quiz_question,
+                [(skill.name, skill.category) for skill in misses]
+            )
+            questions_by_skill.update({skill.id: question_data for skill, question_data in zip(misses, generated)})
+            questions_data = [questions_by_skill[skill.id] for skill in skills]
+            # --- End AI Generation --- #
+
+            # Create the CustomQuiz record and all of its questions in one batch
             new_quiz = CustomQuiz(
                 student=user,
                 upload=upload
             )
             db.session.add(new_quiz)
-            # We need the quiz ID for the questions, so flush to get it.
-            db.session.flush()
-
-            # --- AI Question Generation --- #
-            for missed_skill_log in missed_skills:
-                skill = missed_skill_log.skill
-                print(f"Generating AI question for skill: {skill.name}")
-                
-                # Call AI to generate an original question for this skill
-                question_data = generate_quiz_question(skill.name, skill.category)
-                
-                question = QuizQuestion(
-                    custom_quiz_id=new_quiz.id,
+            db.session.add_all([
+                QuizQuestion(
+                    quiz=new_quiz,
                     skill_id=skill.id,
                     question_text=question_data["question_text"],
                     options=question_data["options"],
                     correct_option=question_data["correct_option"]
                 )
-                db.session.add(question)
-            # --- End AI Generation --- #
+                for skill, question_data in zip(skills, questions_data)
+            ])
 
             db.session.commit()
-            print(f"Custom quiz {new_quiz.id} generated successfully for upload {upload_id}.")
+            logger.info("Custom quiz %s generated for upload %s", new_quiz.id, upload_id)
             return new_quiz
 
         except Exception as e:
             db.session.rollback()
-            print(f"Error generating quiz for upload {upload_id}: {e}") # Use proper logging
+            release_questions(claim_token) # The claim was committed; the quiz was not
+            logger.error("Error generating quiz for upload %s: %s", upload_id, e, exc_info=True)
             return None
 
 def generate_and_deliver_video(queue_item_id):
     """Generates and delivers an AI video lesson."""
-    app = create_app()
-    with app.app_context():
+    with service_app_context():
         queue_item = VideoQueue.query.get(queue_item_id)
         if not queue_item:
-            print(f"Error: VideoQueue item ID {queue_item_id} not found.") # Use logging
+            logger.error("VideoQueue item %s not found", queue_item_id)
             return
 
-        if queue_item.status != 'queued':
-            print(f"Info: VideoQueue item {queue_item_id} is not in 'queued' status (current: {queue_item.status}). Skipping.")
+        # Atomic 'queued' -> 'generating' transition so concurrent workers never
+        # generate the same item twice
+        claimed_at = datetime.utcnow()
+        claimed = db.session.execute(
+            VideoQueue.__table__.update().
+            where(VideoQueue.id == queue_item_id).
+            where(VideoQueue.status == 'queued').
+            values(status='generating', generation_started_at=claimed_at)
+        )
+        db.session.commit()
+        if claimed.rowcount != 1:
+            logger.info("VideoQueue item %s is not in 'queued' status (current: %s); skipping", queue_item_id, queue_item.status)
             return
+        db.session.refresh(queue_item)
 
         user = queue_item.student
         skill = queue_item.skill
 
         try:
-            print(f"Starting video generation for Skill '{skill.name}' (User: {user.username}, Queue ID: {queue_item_id})...")
-            queue_item.status = 'generating'
-            db.session.commit()
+            logger.info("Starting video generation for skill '%s'", skill.name, extra={"user_id": user.id, "skill_id": skill.id})
 
             # --- AI Video Script Generation --- #
-            # 1. Generate the video script using AI
-            video_script = generate_video_script(skill.name, skill.category)
+            # 1. Get a video script for this skill. Scripts depend only on the skill,
+            # so they come from a shared cache (see app/script_cache.py) and are
+            # generated only while the skill's pool of variants is not yet full.
             
             # 2. In a production system, this script would be:
             # - Sent to a text-to-speech service
@@ -220,22 +322,22 @@ def generate_and_deliver_video(queue_item_id):
             # - Rendered into a final video
             # For now, we'll store the script itself as our "video"
             
-            # Create a filename for the script/video
-            timestamp = int(time.time())
-            video_filename = f"video_script_{skill.id}_{user.id}_{timestamp}.txt"
-            
-            # Save the script to a file (this would be a video file in production)
-            script_path = os.path.join(app.instance_path, 'videos')
-            os.makedirs(script_path, exist_ok=True)
-            full_path = os.path.join(script_path, video_filename)
-            
-            with open(full_path, 'w') as f:
-                f.write(video_script)
-            
-            # Video reference is now the path to the script file
-            video_ref = full_path
+            # Video reference is the path to the shared script file. New scripts
+            # are streamed so GET /api/videos/queue/<id>/stream can relay them live.
+            with stage_timer('video_script'):
+                video_ref = get_video_script(skill, queue_item_id=queue_item.id)
             # --- End AI Video Generation --- #
 
+            # Update queue item status, only if this claim still holds: recover_stuck_videos
+            # may have requeued the item, and another worker may have delivered it since
+            delivered = _finish_video_claim(queue_item_id, claimed_at, status='delivered',
+                                            delivery_timestamp=datetime.utcnow(),
+                                            script_stream_path=None) # Moved to video_ref
+            if not delivered:
+                db.session.rollback()
+                logger.warning("VideoQueue item %s was requeued while generating; discarding this result", queue_item_id)
+                return
+
             # Create VideoLesson record
             video_lesson = VideoLesson(
                 skill_id=skill.id,
@@ -244,54 +346,62 @@ def generate_and_deliver_video(queue_item_id):
             )
             db.session.add(video_lesson)
 
-            # Update queue item status
-            queue_item.status = 'delivered'
-            queue_item.delivery_timestamp = datetime.utcnow()
-
             # Update UserSkillProgress status
             status_to_set = 'video_delivered'
-            stmt = user_skill_progress.update().\
-                where(user_skill_progress.c.user_id == user.id).\
-                where(user_skill_progress.c.skill_id == skill.id).\
-                values(status=status_to_set, last_updated=datetime.utcnow())
-            db.session.execute(stmt)
+            apply_progress_transitions([(user.id, skill.id, status_to_set)])
 
             db.session.commit()
-            print(f"Video lesson {video_lesson.id} delivered for Skill '{skill.name}' (User: {user.username}, Queue ID: {queue_item_id}). UserSkillProgress updated to '{status_to_set}'")
+            logger.info("Video lesson %s delivered for skill '%s'", video_lesson.id, skill.name, extra={"user_id": user.id, "skill_id": skill.id})
 
         except Exception as e:
             db.session.rollback()
-            queue_item.status = 'error' # Mark queue item as error
+            # Mark queue item as error, unless it was requeued (and maybe delivered) meanwhile
+            _finish_video_claim(queue_item_id, claimed_at, status='error', script_stream_path=None)
             db.session.commit()
-            print(f"Error generating video for Queue ID {queue_item_id}: {e}") # Use logging
+            logger.error("Error generating video for queue item %s: %s", queue_item_id, e, exc_info=True)
+
+def _finish_video_claim(queue_item_id, claimed_at, **values):
+    """Ends a 'generating' claim made at claimed_at; False if the item was requeued since."""
+    result = db.session.execute(
+        VideoQueue.__table__.update().
+        where(VideoQueue.id == queue_item_id).
+        where(VideoQueue.status == 'generating').
+        where(VideoQueue.generation_started_at == claimed_at).
+        values(**values)
+    )
+    return result.rowcount == 1
 
 def assign_practice_questions(video_lesson_id):
     """Generates and assigns 3 practice questions for a watched video lesson using AI."""
-    app = create_app()
-    with app.app_context():
+    with service_app_context():
         video_lesson = VideoLesson.query.get(video_lesson_id)
         if not video_lesson:
-            print(f"Error: VideoLesson ID {video_lesson_id} not found for practice assignment.")
+            logger.error("VideoLesson %s not found for practice assignment", video_lesson_id)
             return
 
         # Check if practice questions already exist for this lesson
         if video_lesson.practice_questions.count() > 0:
-            print(f"Info: Practice questions already exist for VideoLesson {video_lesson_id}. Skipping.")
+            logger.info("Practice questions already exist for VideoLesson %s; skipping", video_lesson_id)
             return
 
         user = video_lesson.queue_item.student # Assumes queue_item link exists
         skill = video_lesson.skill
 
+        claim_token = new_claim_token()
         try:
-            print(f"Assigning practice questions for Skill '{skill.name}' (User: {user.username}, Video: {video_lesson_id})...")
+            logger.info("Assigning practice questions for skill '%s'", skill.name, extra={"user_id": user.id, "video_id": video_lesson_id})
+
+            # Take pre-generated questions from the question bank first
+            practice_questions_data = take_questions({skill.id: 3}, claim_token=claim_token)[skill.id]
 
             # --- AI Practice Question Generation --- #
-            # Generate 3 practice questions for this skill
-            practice_questions_data = generate_practice_questions(skill.name, skill.category, count=3)
+            # Generate whatever the bank could not supply (3 practice questions in total)
+            if len(practice_questions_data) < 3:
+                practice_questions_data += generate_practice_questions(skill.name, skill.category, count=3 - len(practice_questions_data), shared=False)
             
             generated_questions = []
             for question_data in practice_questions_data:
-                print(f"Generated practice question for skill: {skill.name}")
+                question_logger.info("Generated practice question for skill %s", skill.name, extra={"skill_id": skill.id})
                 
                 question = PracticeQuestion(
                     skill_id=skill.id,
@@ -305,11 +415,14 @@ def assign_practice_questions(video_lesson_id):
             # --- End AI Generation --- #
 
             db.session.commit()
-            print(f"{len(generated_questions)} practice questions assigned for VideoLesson {video_lesson_id}.")
+            logger.info("%d practice questions assigned for VideoLesson %s", len(generated_questions), video_lesson_id)
 
         except Exception as e:
             db.session.rollback()
-            print(f"Error assigning practice questions for VideoLesson {video_lesson_id}: {e}") # Use logging
+            release_questions(claim_token) # The claim was committed; the practice questions were not
+            logger.error("Error assigning practice questions for VideoLesson %s: %s", video_lesson_id, e, exc_info=True)
+
+register_job_handler('analyze_upload', analyze_student_upload, on_give_up=discard_upload_file)
 
 # def generate_quiz(skills):
 #     # Logic to generate original questions for each skill
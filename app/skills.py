@@ -0,0 +1,108 @@
+import threading
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models import Skill, SkillAlias
+from app.utils import normalize_skill_name, dialect_insert
+
+class SkillIndex:
+    """In-process map of normalized skill spellings -> canonical skill ID.
+
+    Loaded from the skill_alias table on first use and extended with
+    committed aliases as new spellings are looked up, so known names need no
+    query at all.
+    """
+
+    def __init__(self):
+        self._ids = {} # alias_key -> skill_id
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._ids.update(db.session.query(SkillAlias.alias_key, SkillAlias.skill_id))
+                self._loaded = True
+
+    def get(self, alias_key):
+        return self._ids.get(alias_key)
+
+    def add(self, mapping):
+        with self._lock:
+            self._ids.update(mapping)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._loaded = False
+
+_skill_index = SkillIndex()
+
+def get_skill_index():
+    return _skill_index
+
+def resolve_skill_ids(skill_dicts):
+    """Maps AI-returned skills to canonical skill IDs, creating unknown ones.
+
+    Spellings that differ only in case, punctuation, '&'/'and' or whitespace
+    resolve to the same skill. Names missing from the in-process index are
+    looked up in one batched alias query; names still unknown are created
+    with upserts, so concurrent workers never create duplicates.
+
+    Args:
+        skill_dicts (list): Dicts with 'name' and optional 'category'
+
+    Returns:
+        list: Unique skill IDs in first-seen order (entries without a name are skipped)
+    """
+    index = get_skill_index()
+    index.ensure_loaded()
+
+    wanted = {} # alias_key -> skill dict, first spelling wins
+    for skill_data in skill_dicts:
+        name = (skill_data.get('name') or '').strip()
+        if name:
+            wanted.setdefault(normalize_skill_name(name), dict(skill_data, name=name))
+
+    missing = [key for key in wanted if index.get(key) is None]
+    if missing:
+        # Picks up skills added by other processes since the index was loaded
+        index.add(dict(db.session.query(SkillAlias.alias_key, SkillAlias.skill_id)
+                       .filter(SkillAlias.alias_key.in_(missing))))
+        missing = [key for key in missing if index.get(key) is None]
+    created = {}
+    if missing:
+        # Not added to the index until committed; the next lookup picks them up
+        created = _create_skills({key: wanted[key] for key in missing})
+
+    return list(dict.fromkeys(index.get(key) or created[key] for key in wanted))
+
+def _create_skills(new_skills):
+    """Upserts skills and their canonical aliases.
+
+    Args:
+        new_skills (dict): alias_key -> skill dict
+
+    Returns:
+        dict: alias_key -> skill ID
+    """
+    now = datetime.utcnow()
+    db.session.execute(dialect_insert(Skill.__table__).on_conflict_do_nothing(), [{
+        "name": skill_data['name'],
+        "category": skill_data.get('category') or "Uncategorized" # Default if category missing
+    } for skill_data in new_skills.values()])
+    ids_by_name = dict(db.session.query(Skill.name, Skill.id)
+                       .filter(Skill.name.in_([skill_data['name'] for skill_data in new_skills.values()])))
+
+    # If another worker claimed the same key first, its mapping wins
+    db.session.execute(dialect_insert(SkillAlias.__table__).on_conflict_do_nothing(), [{
+        "alias_key": key,
+        "skill_id": ids_by_name[skill_data['name']],
+        "created_at": now
+    } for key, skill_data in new_skills.items()])
+    mapping = dict(db.session.query(SkillAlias.alias_key, SkillAlias.skill_id)
+                   .filter(SkillAlias.alias_key.in_(list(new_skills))))
+    current_app.logger.info(f"Created {len(new_skills)} skill(s): {[s['name'] for s in new_skills.values()]}")
+    return mapping
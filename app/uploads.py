@@ -0,0 +1,194 @@
+import codecs
+import hashlib
+import os
+import time
+import uuid
+from flask import current_app
+from app import db
+from app.models import StudentUpload
+from app.jobs import register_periodic_task
+
+PARTIAL_SUFFIX = '.part'
+# Uploads in these states no longer need their file
+TERMINAL_UPLOAD_STATUSES = ('complete', 'expired')
+
+class UploadNotText(ValueError):
+    pass
+
+def upload_folder():
+    return os.path.join(current_app.instance_path, 'uploads')
+
+def store_upload(file_storage, filename):
+    """Writes an uploaded file to a unique path under instance/uploads.
+
+    The content goes to a '.part' file first and is renamed into place once
+    complete, so a file without the suffix is always whole. Concurrent
+    uploads with the same name get different paths.
+
+    Args:
+        file_storage (FileStorage): The uploaded file (request.files[...])
+        filename (str): Sanitized original filename, kept as a suffix
+
+    Returns:
+        tuple: (path, SHA-256 hex digest, size in bytes)
+    """
+    folder = upload_folder()
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{uuid.uuid4().hex}_{filename}")
+    partial_path = path + PARTIAL_SUFFIX
+    try:
+        content_sha256, size_bytes = save_upload(file_storage, partial_path, current_app.config['UPLOAD_CHUNK_SIZE_BYTES'])
+        os.replace(partial_path, path)
+    except BaseException:
+        _remove_file(partial_path)
+        raise
+    return path, content_sha256, size_bytes
+
+def save_upload(file_storage, dest_path, chunk_size=64 * 1024):
+    """Copies an uploaded file to disk in fixed-size chunks, hashing as it writes.
+
+    Only one chunk is held in memory at a time, whatever the upload size.
+    The content is decoded as it is written, so a file that is not UTF-8
+    text (e.g., a PDF or an image) is rejected before it is queued for
+    classification.
+
+    Args:
+        file_storage (FileStorage): The uploaded file (request.files[...])
+        dest_path (str): Where to write it
+        chunk_size (int): Bytes read per iteration
+
+    Returns:
+        tuple: (SHA-256 hex digest of the content, size in bytes)
+
+    Raises:
+        UploadNotText: If the content is not valid UTF-8
+    """
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    size = 0
+    with open(dest_path, 'wb') as f:
+        while True:
+            chunk = file_storage.stream.read(chunk_size)
+            try:
+                decoder.decode(chunk, final=not chunk)
+            except UnicodeDecodeError as e:
+                raise UploadNotText(f"Upload is not UTF-8 text (invalid byte at offset {size + e.start})") from e
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+            f.write(chunk)
+    return digest.hexdigest(), size
+
+def iter_text_windows(path, window_chars, chunk_size=64 * 1024):
+    """Reads a text file in chunks and yields windows of at most window_chars.
+
+    Windows end at a line break when there is one, so a result row is not
+    split across two windows. Content that is not UTF-8 raises
+    UnicodeDecodeError at the first invalid byte instead of being
+    classified as replacement characters.
+
+    Args:
+        path (str): File to read
+        window_chars (int): Maximum characters per window
+        chunk_size (int): Bytes read per iteration
+
+    Yields:
+        str: Consecutive, non-empty windows of the file
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buffer += decoder.decode(chunk, final=not chunk)
+            while len(buffer) >= window_chars:
+                cut = buffer.rfind('\n', 0, window_chars) + 1 or window_chars
+                window, buffer = buffer[:cut], buffer[cut:]
+                if window.strip():
+                    yield window
+            if not chunk:
+                break
+    if buffer.strip():
+        yield buffer
+
+def sweep_uploads():
+    """Deletes upload files that are no longer needed and enforces the disk quota.
+
+    Removed are: files of uploads in a terminal status, files older than
+    UPLOAD_MAX_AGE_SECONDS, and files without an upload row (including
+    '.part' files of interrupted writes) once older than
+    UPLOAD_ORPHAN_GRACE_SECONDS. If the rest still exceeds
+    UPLOAD_DISK_QUOTA_BYTES, the oldest files go first. Uploads whose file was
+    removed before analysis finished are marked 'expired'.
+
+    Returns:
+        int: Number of files removed
+    """
+    config = current_app.config
+    folder = upload_folder()
+    if not os.path.isdir(folder):
+        return 0
+
+    now = time.time()
+    files = []
+    for entry in os.scandir(folder):
+        if entry.is_file():
+            stat = entry.stat()
+            files.append((entry.path, stat.st_size, stat.st_mtime))
+
+    statuses = {} # path -> (upload ID, processing status)
+    paths = [path for path, _, _ in files if not path.endswith(PARTIAL_SUFFIX)]
+    for start in range(0, len(paths), 500): # Stay below the bound parameter limit
+        for upload_id, path, status in db.session.query(
+                StudentUpload.id, StudentUpload.temp_storage_ref, StudentUpload.processing_status)\
+                .filter(StudentUpload.temp_storage_ref.in_(paths[start:start + 500])):
+            statuses[path] = (upload_id, status)
+
+    removed = []
+    kept = []
+    for path, size, mtime in files:
+        age = now - mtime
+        upload = statuses.get(path)
+        if upload is None:
+            if age > config['UPLOAD_ORPHAN_GRACE_SECONDS']: # Grace covers uploads not yet committed
+                removed.append((path, None))
+            else:
+                kept.append((path, size, mtime, None))
+        elif upload[1] in TERMINAL_UPLOAD_STATUSES or age > config['UPLOAD_MAX_AGE_SECONDS']:
+            removed.append((path, upload))
+        else:
+            kept.append((path, size, mtime, upload))
+
+    total = sum(size for _, size, _, _ in kept)
+    if total > config['UPLOAD_DISK_QUOTA_BYTES']:
+        kept.sort(key=lambda item: item[2]) # Oldest first
+        while kept and total > config['UPLOAD_DISK_QUOTA_BYTES']:
+            path, size, _, upload = kept.pop(0)
+            removed.append((path, upload))
+            total -= size
+        current_app.logger.warning(f"Upload storage over quota; evicted the oldest files down to {total} bytes")
+
+    expired_ids = [upload[0] for _, upload in removed if upload and upload[1] not in TERMINAL_UPLOAD_STATUSES]
+    if expired_ids:
+        db.session.execute(
+            StudentUpload.__table__.update().
+            where(StudentUpload.id.in_(expired_ids)).
+            where(StudentUpload.processing_status != 'complete').
+            values(processing_status='expired')
+        )
+    db.session.commit()
+
+    for path, _ in removed:
+        _remove_file(path)
+    if removed:
+        current_app.logger.info(f"Upload sweeper removed {len(removed)} file(s) ({len(expired_ids)} upload(s) expired)")
+    return len(removed)
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+register_periodic_task('sweep_uploads', sweep_uploads, 'UPLOAD_SWEEP_INTERVAL_SECONDS')
@@ -1,4 +1,117 @@
-# Utility functions can go here
+import contextvars
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app import db
 
-# def example_utility_function():
-#     pass 
\ No newline at end of file
+class TTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after ttl_seconds."""
+
+    def __init__(self, max_size=10000, ttl_seconds=300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+def run_concurrently(func, args_list, max_workers=None):
+    """Calls func once per argument tuple on a bounded thread pool.
+
+    Each call runs inside its own app context, so functions that read
+    current_app.config (e.g., the AI service) work from worker threads.
+    Do not touch db.session inside func; collect the results and write
+    them from the calling thread instead.
+
+    Args:
+        func (callable): Function to call
+        args_list (list): List of argument tuples, one per call
+        max_workers (int): Concurrency limit (defaults to AI_MAX_CONCURRENCY)
+
+    Returns:
+        list: Results in the same order as args_list. The first exception
+            raised by any call is re-raised.
+    """
+    if not args_list:
+        return []
+    max_workers = max_workers or current_app.config['AI_MAX_CONCURRENCY']
+    if max_workers <= 1 or len(args_list) == 1:
+        return [func(*args) for args in args_list]
+
+    app = current_app._get_current_object()
+
+    def call_with_context(args):
+        with app.app_context():
+            return func(*args)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(args_list))) as executor:
+        # Each call gets a copy of the caller's context variables (e.g., log correlation IDs)
+        futures = [executor.submit(contextvars.copy_context().run, call_with_context, args) for args in args_list]
+        return [future.result() for future in futures]
+
+def normalize_skill_name(name):
+    """Canonical lookup key for a skill name: case-folded, '&' spelled out,
+    punctuation dropped and whitespace collapsed ("Reading & Writing" and
+    "reading and  writing." share a key)."""
+    name = name.casefold().replace('&', ' and ')
+    return " ".join(re.sub(r"[^\w\s]", " ", name).split())
+
+def dialect_insert(table, bind=None):
+    """Returns an INSERT for table that supports on_conflict_do_nothing() and
+    on_conflict_do_update() on both SQLite and PostgreSQL.
+
+    Args:
+        table (Table): Target table
+        bind (Connection): Connection whose dialect to use (defaults to the session's)
+    """
+    dialect = (bind or db.session.get_bind()).dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upserts are not implemented for {dialect}")
+    return insert(table)
@@ -0,0 +1,88 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import VideoQueue
+from app.services import generate_and_deliver_video
+from app.logs import log_context
+
+def recover_stuck_videos():
+    """Requeues items left in 'generating' longer than VIDEO_GENERATION_TIMEOUT_SECONDS
+    (e.g., after a worker crashed mid-generation). If the original worker was only
+    slow, its result is discarded when it finishes: generate_and_deliver_video
+    completes an item only while its own claim still holds.
+
+    Returns:
+        int: Number of items requeued
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['VIDEO_GENERATION_TIMEOUT_SECONDS'])
+    stmt = VideoQueue.__table__.update().\
+        where(VideoQueue.status == 'generating').\
+        where(VideoQueue.generation_started_at < cutoff).\
+        values(status='queued', generation_started_at=None, script_stream_path=None, script_bytes=0)
+    result = db.session.execute(stmt)
+    db.session.commit()
+    if result.rowcount:
+        current_app.logger.warning(f"Requeued {result.rowcount} video(s) stuck in 'generating'")
+    return result.rowcount
+
+def next_queued_videos(limit, exclude=()):
+    """Returns the IDs of the oldest queued items (claimed later by generate_and_deliver_video)."""
+    query = db.session.query(VideoQueue.id).filter(VideoQueue.status == 'queued')
+    if exclude:
+        query = query.filter(VideoQueue.id.notin_(list(exclude)))
+    return [row.id for row in query.order_by(VideoQueue.queue_timestamp, VideoQueue.id).limit(limit)]
+
+def run_video_worker(concurrency=None, poll_interval=None, burst=False):
+    """Drains the VideoQueue, generating up to `concurrency` videos at a time.
+
+    Each item runs generate_and_deliver_video in its own thread and app context
+    (and therefore its own session). The function claims the item with an
+    atomic 'queued' -> 'generating' update, so any number of workers can run
+    side by side. Must run inside an app context.
+
+    Args:
+        concurrency (int): Parallel generations (defaults to VIDEO_WORKER_CONCURRENCY)
+        poll_interval (float): Seconds to sleep when the queue is empty
+        burst (bool): Return once the queue is empty instead of polling
+
+    Returns:
+        int: Number of items processed
+    """
+    config = current_app.config
+    concurrency = concurrency or config['VIDEO_WORKER_CONCURRENCY']
+    poll_interval = poll_interval if poll_interval is not None else config['VIDEO_WORKER_POLL_INTERVAL_SECONDS']
+    app = current_app._get_current_object()
+
+    def process(queue_item_id):
+        with app.app_context(), log_context(queue_item_id=queue_item_id):
+            generate_and_deliver_video(queue_item_id)
+
+    in_flight = {} # future -> queue item ID
+    processed = 0
+    current_app.logger.info(f"Video worker started (concurrency: {concurrency})")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            recover_stuck_videos()
+            free_slots = concurrency - len(in_flight)
+            if free_slots > 0:
+                for queue_item_id in next_queued_videos(free_slots, exclude=in_flight.values()):
+                    in_flight[executor.submit(process, queue_item_id)] = queue_item_id
+            db.session.remove() # Do not hold a connection while waiting
+
+            if not in_flight:
+                if burst:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(list(in_flight), timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                queue_item_id = in_flight.pop(future)
+                processed += 1
+                try:
+                    future.result()
+                except Exception as e:
+                    current_app.logger.error(f"Video worker failed on queue item {queue_item_id}: {e}", exc_info=True)
@@ -0,0 +1,197 @@
+"""Read/write throughput of the database engine profiles under concurrent API load.
+
+For each profile (see DB_ENGINE_PROFILES in config.py), starts an app on its
+own scratch database, seeds students with skill progress and runs reader
+and writer threads against the API for a fixed time:
+
+    readers: GET /api/users/<id>/progress and GET /api/users/<id>/bonsai
+    writers: POST /api/upload (an upload row plus its analysis job; no
+             workers run, so jobs just accumulate)
+
+Requests go through the Flask test client like bench/loadtest.py. Reports
+operations per second, p50/p95 latency and errors (e.g., "database is
+locked") per profile:
+
+    python -m bench.dbprofiles --seconds 10 --readers 8 --writers 4
+    python -m bench.dbprofiles --database-url postgresql://localhost/bonsai_bench --profiles postgresql,default
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.loadtest import PRACTICE_TEST, create_bench_app, percentile
+
+class Operations:
+    """Latencies and errors of one kind of operation, shared by its threads."""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.error_samples = set()
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error=None):
+        with self._lock:
+            if error is None:
+                self.latencies.append(seconds)
+            else:
+                self.errors += 1
+                if len(self.error_samples) < 3:
+                    self.error_samples.add(error)
+
+    def summary(self, elapsed):
+        return {
+            "ops": len(self.latencies),
+            "per_second": round(len(self.latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 1),
+            "errors": self.errors,
+            "error_samples": sorted(self.error_samples)
+        }
+
+def seed_students(app, args):
+    """Creates the students and gives each some skill progress to read back.
+
+    Returns:
+        list: (user_id, api_key) tuples
+    """
+    from app import db
+    from app.models import Skill, User
+    from app.progress import apply_progress_transitions
+
+    with app.app_context():
+        skills = []
+        for i in range(args.skills):
+            name = f"Bench Skill {i + 1}"
+            skill = Skill.query.filter_by(name=name).first()
+            if not skill:
+                skill = Skill(name=name, category="Bench")
+                db.session.add(skill)
+            skills.append(skill)
+        students = []
+        for i in range(args.students):
+            user = User(username=f"bench-db-{os.getpid()}-{i}-{random.randrange(10 ** 6)}")
+            user.generate_api_key()
+            db.session.add(user)
+            students.append(user)
+        db.session.flush()
+        apply_progress_transitions((user.id, skill.id, 'missed') for user in students for skill in skills)
+        db.session.commit()
+        return [(user.id, user.api_key) for user in students]
+
+def run_profile(profile, database_url, instance_path, args):
+    from app import db
+
+    app = create_bench_app(database_url, 'http://127.0.0.1:9/v1', instance_path,
+                           log_level='INFO' if args.verbose else 'CRITICAL', engine_profile=profile)
+    students = seed_students(app, args)
+    reads, writes = Operations(), Operations()
+    stop = threading.Event()
+
+    def read_loop():
+        client = app.test_client()
+        rng = random.Random()
+        while not stop.is_set():
+            user_id, api_key = rng.choice(students)
+            path = f'/api/users/{user_id}/progress' if rng.random() < 0.5 else f'/api/users/{user_id}/bonsai'
+            start = time.perf_counter()
+            response = client.get(path, headers={'X-API-Key': api_key})
+            reads.record(time.perf_counter() - start,
+                         None if response.status_code == 200 else f"GET {response.status_code}")
+
+    def write_loop():
+        client = app.test_client()
+        rng = random.Random()
+        while not stop.is_set():
+            user_id, api_key = rng.choice(students)
+            content = f"Student: {user_id}\nTest: {PRACTICE_TEST}\nQuestion 1: Incorrect\nAttempt: {rng.random()}\n"
+            data = {'practice_test_identifier': PRACTICE_TEST, 'file': (io.BytesIO(content.encode('utf-8')), 'results.txt')}
+            start = time.perf_counter()
+            response = client.post('/api/upload', headers={'X-API-Key': api_key}, data=data, content_type='multipart/form-data')
+            error = None
+            if response.status_code != 202:
+                error = f"POST {response.status_code}: {(response.get_json() or {}).get('error')}"
+            writes.record(time.perf_counter() - start, error)
+
+    threads = [threading.Thread(target=read_loop, daemon=True) for _ in range(args.readers)]
+    threads += [threading.Thread(target=write_loop, daemon=True) for _ in range(args.writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        resolved = app.config['DB_ENGINE_PROFILE_NAMES'][None]
+        options = dict(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        pragmas = app.config['DB_ENGINE_PROFILES'][resolved].get('pragmas') if db.engine.dialect.name == 'sqlite' else None
+        db.engine.dispose()
+    return {
+        "profile": profile,
+        "resolved_profile": resolved,
+        "engine_options": options,
+        "pragmas": pragmas,
+        "elapsed_s": round(elapsed, 2),
+        "reads": reads.summary(elapsed),
+        "writes": writes.summary(elapsed)
+    }
+
+def print_report(results):
+    print(f"\n{'profile':<14}{'reads/s':>10}{'read p50':>10}{'read p95':>10}{'errors':>8}"
+          f"{'writes/s':>10}{'write p50':>11}{'write p95':>11}{'errors':>8}")
+    for result in results:
+        reads, writes = result["reads"], result["writes"]
+        print(f"{result['resolved_profile']:<14}{reads['per_second']:>10}{reads['p50_ms']:>10}{reads['p95_ms']:>10}{reads['errors']:>8}"
+              f"{writes['per_second']:>10}{writes['p50_ms']:>11}{writes['p95_ms']:>11}{writes['errors']:>8}")
+    for result in results:
+        for kind in ('reads', 'writes'):
+            for sample in result[kind]["error_samples"]:
+                print(f"  {result['resolved_profile']} {kind} error: {sample}")
+    print("\nLatencies in ms.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read/write throughput of the DB engine profiles under concurrent API load")
+    parser.add_argument('--profiles', default='default,sqlite',
+                        help="Comma-separated DB_ENGINE_PROFILE values to compare")
+    parser.add_argument('--database-url', help="Database to run against (defaults to a fresh scratch SQLite file per profile)")
+    parser.add_argument('--seconds', type=float, default=10, help="Duration of each run")
+    parser.add_argument('--readers', type=int, default=8, help="Threads issuing progress and bonsai reads")
+    parser.add_argument('--writers', type=int, default=4, help="Threads issuing uploads")
+    parser.add_argument('--students', type=int, default=20, help="Users the threads act as")
+    parser.add_argument('--skills', type=int, default=10, help="Progress rows per user")
+    parser.add_argument('--verbose', action='store_true', help="Show the app's INFO logs")
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for profile in [name.strip() for name in args.profiles.split(',') if name.strip()]:
+        scratch = tempfile.mkdtemp(prefix='bonsai-dbbench-')
+        try:
+            database_url = args.database_url or f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+            print(f"Profile {profile}: {args.readers} reader(s), {args.writers} writer(s) for {args.seconds}s...")
+            results.append(run_profile(profile, database_url, os.path.join(scratch, 'instance'), args))
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"\nResults written to {args.json}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""Local stand-in for the OpenAI chat completions API.
+
+Answers POST /v1/chat/completions with responses shaped like the ones
+app/ai_service.py expects (skill lists, quiz questions, question batches and
+video scripts, streamed or not), after a configurable delay. A share of calls
+can fail with 429 or 5xx to exercise the retry path. Point the app at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 and any OPENAI_API_KEY.
+
+Run standalone:
+    python -m bench.fake_openai --port 8089 --latency-ms 800
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SKILL_POOL = [
+    {"name": "Linear Equations", "category": "Math"},
+    {"name": "Systems of Equations", "category": "Math"},
+    {"name": "Quadratic Functions", "category": "Math"},
+    {"name": "Data Interpretation", "category": "Math"},
+    {"name": "Ratios and Percentages", "category": "Math"},
+    {"name": "Geometry and Trigonometry", "category": "Math"},
+    {"name": "Comma Usage", "category": "Reading & Writing"},
+    {"name": "Tone Analysis", "category": "Reading & Writing"},
+    {"name": "Vocabulary in Context", "category": "Reading & Writing"},
+    {"name": "Transitions", "category": "Reading & Writing"},
+    {"name": "Central Ideas", "category": "Reading & Writing"},
+    {"name": "Subject-Verb Agreement", "category": "Reading & Writing"}
+]
+
+# Every generated question has this answer, so load clients can choose to answer correctly
+CORRECT_OPTION = "A"
+
+class FakeOpenAIServer:
+    """Threaded HTTP server imitating chat completions.
+
+    Args:
+        host (str): Interface to bind
+        port (int): Port to bind (0 picks a free one)
+        latency_ms (float): Mean delay before a response starts
+        latency_jitter_ms (float): Uniform +/- jitter added to the delay
+        error_rate (float): Share of calls (0-1) answered with error_status
+        error_status (int): HTTP status of injected errors (429 sends Retry-After)
+        completion_tokens (int): Approximate size of video scripts, in tokens
+        stream_chunk_tokens (int): Tokens per streamed chunk
+        skills_per_upload (int): Skills returned per classification call
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=500, latency_jitter_ms=100, error_rate=0.0,
+                 error_status=429, completion_tokens=800, stream_chunk_tokens=20, skills_per_upload=3):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.completion_tokens = completion_tokens
+        self.stream_chunk_tokens = stream_chunk_tokens
+        self.skills_per_upload = skills_per_upload
+        self._calls = {} # kind -> count
+        self._errors = 0
+        self._tokens = {"prompt": 0, "completion": 0}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-openai', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": dict(self._calls),
+                "total_calls": sum(self._calls.values()),
+                "injected_errors": self._errors,
+                "prompt_tokens": self._tokens["prompt"],
+                "completion_tokens": self._tokens["completion"]
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._calls.clear()
+            self._errors = 0
+            self._tokens = {"prompt": 0, "completion": 0}
+
+    def _delay(self):
+        jitter = random.uniform(-self.latency_jitter_ms, self.latency_jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+    def _record(self, kind, prompt_tokens, completion_tokens, error=False):
+        with self._lock:
+            self._calls[kind] = self._calls.get(kind, 0) + 1
+            if error:
+                self._errors += 1
+            self._tokens["prompt"] += prompt_tokens
+            self._tokens["completion"] += completion_tokens
+
+    def respond(self, body):
+        """Builds the response for a chat completions request body.
+
+        Returns:
+            tuple: (kind, content str or None on an injected error, prompt tokens)
+        """
+        prompt = "\n".join(message.get("content") or "" for message in body.get("messages", []))
+        kind, content = _answer(prompt, self)
+        prompt_tokens = len(prompt) // 4
+        if random.random() < self.error_rate:
+            self._record(kind, prompt_tokens, 0, error=True)
+            return kind, None, prompt_tokens
+        self._record(kind, prompt_tokens, len(content) // 4)
+        return kind, content, prompt_tokens
+
+def _answer(prompt, server):
+    """Classifies the prompt by what app/ai_service.py asks for and builds a matching answer."""
+    if "identify which specific skills" in prompt:
+        # Same text -> same skills, like a deterministic model
+        seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16)
+        skills = random.Random(seed).sample(SKILL_POOL, min(server.skills_per_upload, len(SKILL_POOL)))
+        return "classify", json.dumps({"skills": skills})
+    batch = re.search(r"Create (\d+) original SAT-style questions", prompt)
+    if batch:
+        return "question_batch", json.dumps({"questions": [_question(i + 1) for i in range(int(batch.group(1)))]})
+    if "Create an original SAT-style question" in prompt:
+        return "quiz_question", json.dumps(_question(1))
+    if "script for a 5-minute educational video" in prompt:
+        words = ["Let's", "work", "through", "this", "concept", "step", "by", "step."]
+        text = " ".join(words[i % len(words)] for i in range(server.completion_tokens))
+        return "video_script", f"INTRODUCTION\n{text}\n"
+    return "other", "OK"
+
+def _question(number):
+    return {
+        "question_text": f"Benchmark question {number} ({uuid.uuid4().hex[:8]}): which option is correct?",
+        "options": {"A": "This one", "B": "Not this", "C": "Nor this", "D": "None of these"},
+        "correct_option": CORRECT_OPTION
+    }
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # Keep-alive, like the real API
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+                return
+
+            server._delay()
+            kind, content, prompt_tokens = server.respond(body)
+            if content is None:
+                headers = {"Retry-After": "1"} if server.error_status == 429 else {}
+                self._send_json(server.error_status, {"error": {"message": f"Injected {kind} error", "type": "server_error"}}, headers)
+                return
+
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            model = body.get("model", "fake-model")
+            if body.get("stream"):
+                self._stream(completion_id, model, content)
+                return
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(content) // 4,
+                    "total_tokens": prompt_tokens + len(content) // 4
+                }
+            })
+
+        def _stream(self, completion_id, model, content):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close') # No chunked encoding; the end of the body ends the stream
+            self.end_headers()
+            step = max(1, server.stream_chunk_tokens) * 4 # ~4 characters per token
+            pause = server.latency_ms / 1000 / max(1, len(content) // step) # Spread generation like the first-token delay
+            for start in range(0, len(content), step):
+                self._send_event({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": {"content": content[start:start + step]}, "finish_reason": None}]
+                })
+                time.sleep(pause)
+            self._send_event({
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            })
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+        def _send_event(self, data):
+            self.wfile.write(f"data: {json.dumps(data)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        def _send_json(self, status, data, headers=None):
+            payload = json.dumps(data).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass # One line per call would drown the benchmark output
+
+    return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI chat completions API")
+    add_server_arguments(parser)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    args = parser.parse_args(argv)
+
+    server = server_from_args(args, host=args.host, port=args.port).start()
+    print(f"Fake OpenAI API listening on {server.base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(server.stats()))
+    except KeyboardInterrupt:
+        server.stop()
+
+def add_server_arguments(parser):
+    group = parser.add_argument_group('fake OpenAI server')
+    group.add_argument('--latency-ms', type=float, default=500, help="Mean delay before each response starts")
+    group.add_argument('--latency-jitter-ms', type=float, default=100, help="Uniform +/- jitter on the delay")
+    group.add_argument('--error-rate', type=float, default=0.0, help="Share of calls (0-1) that fail")
+    group.add_argument('--error-status', type=int, default=429, help="HTTP status of failed calls")
+    group.add_argument('--completion-tokens', type=int, default=800, help="Approximate video script size in tokens")
+    group.add_argument('--skills-per-upload', type=int, default=3, help="Skills returned per classification call")
+
+def server_from_args(args, host='127.0.0.1', port=0):
+    return FakeOpenAIServer(
+        host=host, port=port,
+        latency_ms=args.latency_ms, latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate, error_status=args.error_status,
+        completion_tokens=args.completion_tokens, skills_per_upload=args.skills_per_upload
+    )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,386 @@
+"""End-to-end load benchmark for the student flow.
+
+Starts the fake OpenAI server (bench/fake_openai.py), an app on a scratch
+database with in-process job and video workers, and runs simulated students
+through upload -> quiz -> submit -> video stream -> watched -> practice at the
+requested concurrency. Requests go through the Flask test client, so
+latencies include all app and DB work but no network hop.
+
+Reports p50/p95/p99 latency per step and per flow, requests per second, DB
+statements per step (plus background work) and LLM calls by kind. Save a
+run with --json and pass it back with --baseline to compare:
+
+    python -m bench.loadtest --flows 40 --concurrency 8 --json baseline.json
+    python -m bench.loadtest --flows 40 --concurrency 8 --baseline baseline.json
+"""
+import argparse
+import io
+import json
+import math
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fake_openai import CORRECT_OPTION, add_server_arguments, server_from_args
+
+PRACTICE_TEST = "Bench Test"
+WRONG_OPTION = "B"
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0.0 if empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+class Recorder:
+    """Collects step latencies and attributes DB statements to the step running on each thread."""
+
+    def __init__(self):
+        self.steps = {} # step -> {"latencies": [...], "errors": int, "statements": int}
+        self.flows = [] # Completed flow durations
+        self.failed_flows = 0
+        self.background_statements = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def on_statement(self, *args):
+        step = getattr(self._local, 'step', None)
+        with self._lock:
+            if step is None:
+                self.background_statements += 1
+            else:
+                self._entry(step)["statements"] += 1
+
+    @contextmanager
+    def step(self, name):
+        self._local.step = name
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            elapsed = time.perf_counter() - start
+            self._local.step = None
+            with self._lock:
+                entry = self._entry(name)
+                entry["latencies"].append(elapsed)
+                if not ok:
+                    entry["errors"] += 1
+
+    def _entry(self, name):
+        return self.steps.setdefault(name, {"latencies": [], "errors": 0, "statements": 0})
+
+class FlowError(Exception):
+    pass
+
+class Student:
+    """Runs one student's flows against the app through its own test client."""
+
+    def __init__(self, app, recorder, api_key, args):
+        self.client = app.test_client()
+        self.recorder = recorder
+        self.headers = {'X-API-Key': api_key}
+        self.args = args
+        self.random = random.Random()
+
+    def run_flow(self, flow_number):
+        start = time.perf_counter()
+        try:
+            quiz_id = self._upload(flow_number)
+            questions = self._request('get_quiz', 'get', f'/api/quizzes/{quiz_id}')['questions']
+            answers = {str(q['question_id']): (WRONG_OPTION if self.random.random() < self.args.quiz_miss_rate else CORRECT_OPTION)
+                       for q in questions}
+            results = self._request('submit_quiz', 'post', f'/api/quizzes/{quiz_id}/submit', json={"answers": answers})['results']
+            for stream in results.get('video_streams', []):
+                video_id = self._stream_video(stream['stream_url'])
+                self._request('mark_watched', 'post', f'/api/videos/{video_id}/watched')
+                practice = self._request('get_practice', 'get', f'/api/videos/{video_id}/practice')['questions']
+                failed = self.random.random() < self.args.practice_fail_rate
+                self._request('submit_practice', 'post', f'/api/videos/{video_id}/practice/submit', json={"answers": {
+                    str(q['question_id']): WRONG_OPTION if failed else CORRECT_OPTION for q in practice
+                }})
+        except FlowError as e:
+            print(f"Flow {flow_number} failed: {e}", file=sys.stderr)
+            with self.recorder._lock:
+                self.recorder.failed_flows += 1
+            return
+        with self.recorder._lock:
+            self.recorder.flows.append(time.perf_counter() - start)
+
+    def _upload(self, flow_number):
+        lines = [f"Student: Bench {flow_number}", f"Test: {PRACTICE_TEST}", ""]
+        for i in range(self.args.upload_questions):
+            result = "Correct" if self.random.random() < 0.5 else "Incorrect"
+            lines.append(f"Question {i + 1}: {result}")
+        if not self.args.repeat_uploads:
+            lines.append(f"Attempt: {flow_number}-{self.random.random()}") # Defeats the classification caches
+        data = {'practice_test_identifier': PRACTICE_TEST, 'file': (io.BytesIO("\n".join(lines).encode('utf-8')), 'results.txt')}
+        upload = self._request('upload', 'post', '/api/upload', data=data, content_type='multipart/form-data', expect=202)
+
+        # Time until the quiz exists, polled like a client would
+        deadline = time.monotonic() + self.args.timeout
+        with self.recorder.step('wait_for_quiz'):
+            while True:
+                status = self._request('upload_status', 'get', upload['status_url'])
+                if status['quiz_id']:
+                    return status['quiz_id']
+                if status['status'] in ('error', 'expired') or (status['job'] or {}).get('status') == 'error':
+                    raise FlowError(f"upload {upload['upload_id']} ended in status {status['status']}")
+                if time.monotonic() > deadline:
+                    raise FlowError(f"timed out waiting for the quiz of upload {upload['upload_id']}")
+                time.sleep(self.args.poll_interval)
+
+    def _stream_video(self, stream_url):
+        """Reads the SSE stream, reconnecting when asked, until the video is delivered; returns its video ID."""
+        with self.recorder.step('stream_video'):
+            last_event_id = None
+            while True:
+                headers = dict(self.headers, **({'Last-Event-ID': last_event_id} if last_event_id else {}))
+                response = self.client.get(stream_url, headers=headers, buffered=False)
+                if response.status_code != 200:
+                    raise FlowError(f"GET {stream_url} returned {response.status_code}")
+                event = None
+                reconnect = False
+                try:
+                    for line in b"".join(response.response).decode('utf-8').splitlines():
+                        if line.startswith('id: '):
+                            last_event_id = line[len('id: '):]
+                        elif line.startswith('event: '):
+                            event = line[len('event: '):]
+                        elif line.startswith('data: ') and event == 'reconnect':
+                            reconnect = True
+                        elif line.startswith('data: ') and event in ('done', 'error'):
+                            data = json.loads(line[len('data: '):])
+                            if event == 'error' or not data.get('video_id'):
+                                raise FlowError(f"video stream {stream_url} failed: {data}")
+                            return data['video_id']
+                finally:
+                    response.close()
+                if not reconnect:
+                    raise FlowError(f"video stream {stream_url} ended without a result")
+
+    def _request(self, step, method, url, expect=200, **kwargs):
+        with self.recorder.step(step):
+            response = getattr(self.client, method)(url, headers=self.headers, **kwargs)
+            if response.status_code != expect:
+                raise FlowError(f"{method.upper()} {url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+            return response.get_json()
+
+def run_workers(app, args, stop):
+    """Starts job and video worker threads that drain their queues until stop is set."""
+    from app.jobs import run_worker
+    from app.video_worker import run_video_worker
+
+    def loop(func, **kwargs):
+        with app.app_context():
+            while not stop.is_set():
+                if not func(burst=True, **kwargs):
+                    stop.wait(args.poll_interval)
+
+    threads = [threading.Thread(target=loop, args=(run_worker,), kwargs={"poll_interval": args.poll_interval}, daemon=True)
+               for _ in range(args.job_workers)]
+    threads += [threading.Thread(target=loop, args=(run_video_worker,), kwargs={"poll_interval": args.poll_interval}, daemon=True)
+                for _ in range(args.video_workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def create_bench_app(database_url, openai_base_url, instance_path, log_level='WARNING', engine_profile='auto'):
+    from config import Config
+    from app import create_app, db
+    from app.models import PracticeTest
+    from flask_migrate import upgrade
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        OPENAI_BASE_URL = openai_base_url
+        OPENAI_API_KEY = 'bench'
+        LOG_LEVEL = log_level
+        DB_ENGINE_PROFILE = engine_profile
+
+    app = create_app(BenchConfig)
+    app.instance_path = instance_path
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        if not PracticeTest.query.filter_by(identifier=PRACTICE_TEST).first():
+            db.session.add(PracticeTest(identifier=PRACTICE_TEST))
+            db.session.commit()
+    return app
+
+def create_students(app, recorder, args):
+    from app import db
+    from app.models import User
+
+    keys = []
+    with app.app_context():
+        for i in range(args.students):
+            user = User(username=f"bench-{os.getpid()}-{i}-{random.randrange(10 ** 6)}")
+            user.generate_api_key()
+            db.session.add(user)
+            keys.append(user.api_key)
+        db.session.commit()
+    return [Student(app, recorder, key, args) for key in keys]
+
+def summarize(recorder, elapsed, llm_stats, args):
+    requests = sum(len(entry["latencies"]) for name, entry in recorder.steps.items() if name != 'wait_for_quiz')
+    completed = len(recorder.flows)
+    steps = {}
+    for name, entry in sorted(recorder.steps.items()):
+        latencies = entry["latencies"]
+        steps[name] = {
+            "count": len(latencies),
+            "errors": entry["errors"],
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "db_statements": entry["statements"],
+            "db_statements_per_call": round(entry["statements"] / len(latencies), 1) if latencies else 0.0
+        }
+    request_statements = sum(entry["statements"] for entry in recorder.steps.values())
+    return {
+        "settings": {key: value for key, value in vars(args).items() if key not in ('json', 'baseline', 'verbose')},
+        "elapsed_s": round(elapsed, 2),
+        "flows": {
+            "completed": completed,
+            "failed": recorder.failed_flows,
+            "per_second": round(completed / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(recorder.flows, 50) * 1000, 1),
+            "p95_ms": round(percentile(recorder.flows, 95) * 1000, 1),
+            "p99_ms": round(percentile(recorder.flows, 99) * 1000, 1)
+        },
+        "requests": {"total": requests, "per_second": round(requests / elapsed, 2) if elapsed else 0.0},
+        "db_statements": {
+            "requests": request_statements,
+            "background": recorder.background_statements,
+            "per_flow": round((request_statements + recorder.background_statements) / completed, 1) if completed else 0.0
+        },
+        "llm": dict(llm_stats, per_flow=round(llm_stats["total_calls"] / completed, 2) if completed else 0.0),
+        "steps": steps
+    }
+
+def print_report(report, baseline=None):
+    def delta(path, value):
+        if baseline is None:
+            return ""
+        base = baseline
+        for key in path:
+            base = base.get(key) if isinstance(base, dict) else None
+        if not isinstance(base, (int, float)) or not base:
+            return ""
+        return f" ({(value - base) / base * 100:+.0f}%)"
+
+    flows = report["flows"]
+    print(f"\nFlows: {flows['completed']} completed, {flows['failed']} failed in {report['elapsed_s']}s "
+          f"- {flows['per_second']} flows/s{delta(('flows', 'per_second'), flows['per_second'])}")
+    print(f"Flow latency ms: p50 {flows['p50_ms']}{delta(('flows', 'p50_ms'), flows['p50_ms'])}, "
+          f"p95 {flows['p95_ms']}{delta(('flows', 'p95_ms'), flows['p95_ms'])}, "
+          f"p99 {flows['p99_ms']}{delta(('flows', 'p99_ms'), flows['p99_ms'])}")
+    print(f"Requests: {report['requests']['total']} - {report['requests']['per_second']} req/s"
+          f"{delta(('requests', 'per_second'), report['requests']['per_second'])}")
+    statements = report["db_statements"]
+    print(f"DB statements: {statements['requests']} in requests, {statements['background']} in workers, "
+          f"{statements['per_flow']} per flow{delta(('db_statements', 'per_flow'), statements['per_flow'])}")
+    llm = report["llm"]
+    print(f"LLM calls: {llm['total_calls']} ({llm['per_flow']} per flow{delta(('llm', 'per_flow'), llm['per_flow'])}), "
+          f"{llm['injected_errors']} injected errors, by kind: {llm['calls']}")
+
+    print(f"\n{'step':<16}{'count':>7}{'errors':>7}{'p50 ms':>16}{'p95 ms':>16}{'p99 ms':>16}{'stmts/call':>18}")
+    for name, step in report["steps"].items():
+        cells = [
+            f"{step[key]}{delta(('steps', name, key), step[key])}"
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'db_statements_per_call')
+        ]
+        print(f"{name:<16}{step['count']:>7}{step['errors']:>7}{cells[0]:>16}{cells[1]:>16}{cells[2]:>16}{cells[3]:>18}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end load benchmark against a fake OpenAI server")
+    parser.add_argument('--flows', type=int, default=20, help="Student flows to run in total")
+    parser.add_argument('--concurrency', type=int, default=4, help="Flows running at the same time")
+    parser.add_argument('--students', type=int, default=None, help="Distinct users (defaults to --concurrency)")
+    parser.add_argument('--quiz-miss-rate', type=float, default=0.3, help="Share of quiz answers that are wrong (each queues a video)")
+    parser.add_argument('--practice-fail-rate', type=float, default=0.2, help="Share of practice sets answered wrongly")
+    parser.add_argument('--upload-questions', type=int, default=20, help="Result lines per uploaded file")
+    parser.add_argument('--repeat-uploads', action='store_true', help="Let identical uploads hit the classification caches")
+    parser.add_argument('--job-workers', type=int, default=2, help="In-process `flask worker` threads")
+    parser.add_argument('--video-workers', type=int, default=1, help="In-process `flask video-worker` threads")
+    parser.add_argument('--poll-interval', type=float, default=0.1, help="Seconds between client and worker polls")
+    parser.add_argument('--timeout', type=float, default=300, help="Seconds a flow may wait for its quiz")
+    parser.add_argument('--database-url', help="Database to run against (defaults to a scratch SQLite file)")
+    parser.add_argument('--db-profile', default='auto', help="DB_ENGINE_PROFILE for the app (auto, sqlite, postgresql or default)")
+    parser.add_argument('--verbose', action='store_true', help="Show the app's INFO logs and print output")
+    parser.add_argument('--json', help="Write the report to this file")
+    parser.add_argument('--baseline', help="Earlier --json report to compare against")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+    args.students = args.students or args.concurrency
+
+    scratch = tempfile.mkdtemp(prefix='bonsai-bench-')
+    server = server_from_args(args).start()
+    stop = threading.Event()
+    try:
+        database_url = args.database_url or f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+        app = create_bench_app(database_url, server.base_url, os.path.join(scratch, 'instance'),
+                               log_level='INFO' if args.verbose else 'WARNING', engine_profile=args.db_profile)
+        recorder = Recorder()
+        students = create_students(app, recorder, args)
+
+        from sqlalchemy import event
+        from app import db
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', recorder.on_statement)
+        server.reset_stats()
+
+        workers = run_workers(app, args, stop)
+        print(f"Running {args.flows} flow(s) at concurrency {args.concurrency} "
+              f"(LLM latency {args.latency_ms}ms, error rate {args.error_rate})...")
+        start = time.perf_counter()
+        idle = queue.Queue() # A student runs one flow at a time
+        for student in students:
+            idle.put(student)
+
+        def run_flow(flow_number):
+            student = idle.get()
+            try:
+                student.run_flow(flow_number)
+            finally:
+                idle.put(student)
+
+        with redirect_stdout(sys.stdout if args.verbose else open(os.devnull, 'w')):
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                for flow_number in range(args.flows):
+                    executor.submit(run_flow, flow_number)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for thread in workers:
+            thread.join(timeout=args.timeout)
+
+        report = summarize(recorder, elapsed, server.stats(), args)
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        print_report(report, baseline)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"\nReport written to {args.json}")
+        return 0 if not recorder.failed_flows else 1
+    finally:
+        stop.set()
+        server.stop()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,8 +9,126 @@ class Config:
         'sqlite:///' + os.path.join(os.path.abspath(os.path.dirname(__file__)), 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Read replica for the read-only endpoints (progress, bonsai, quiz and practice
+    # questions); unset sends everything to DATABASE_URL. Migrations only touch the primary.
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    DB_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS') or 10) # After a user's own write (user.last_write_at), their reads use the primary this long; keep above replication lag
+    DB_REPLICA_ENGINE_PROFILE = os.environ.get('DB_REPLICA_ENGINE_PROFILE') or 'auto' # Engine profile of the replica, resolved against its own URL
+    
+    # Database engine profiles (applied by app/engine_profiles.py). 'auto' picks the
+    # profile matching the DATABASE_URL dialect; 'default' keeps SQLAlchemy's defaults.
+    # Options set explicitly in SQLALCHEMY_ENGINE_OPTIONS take precedence.
+    DB_ENGINE_PROFILE = os.environ.get('DB_ENGINE_PROFILE') or 'auto'
+    DB_ENGINE_PROFILES = {
+        'sqlite': {
+            # Set on every new connection; WAL lets readers run alongside the single writer
+            'pragmas': {
+                'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL',
+                'synchronous': os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL', # Safe with WAL; fsync at checkpoints only
+                'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000), # Wait for locks instead of failing with "database is locked"
+                'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE_BYTES') or 256 * 1024 * 1024)
+            },
+            'engine_options': {}
+        },
+        'postgresql': {
+            'engine_options': {
+                'pool_size': int(os.environ.get('DB_POOL_SIZE') or 10), # Per process; keep workers x processes below max_connections
+                'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 20),
+                'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT_SECONDS') or 30),
+                'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE_SECONDS') or 1800), # Reconnect before server or proxy idle timeouts
+                'pool_pre_ping': (os.environ.get('DB_POOL_PRE_PING') or 'true').lower() == 'true' # Replace connections dropped while idle
+            }
+        },
+        'default': {}
+    }
+    
+    # Uploads (see app/uploads.py)
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH') or 5 * 1024 * 1024) # Larger requests are rejected with 413
+    UPLOAD_CHUNK_SIZE_BYTES = int(os.environ.get('UPLOAD_CHUNK_SIZE_BYTES') or 64 * 1024) # Uploads are copied and read in chunks of this size
+    CLASSIFY_WINDOW_CHARS = int(os.environ.get('CLASSIFY_WINDOW_CHARS') or 24000) # Text per classification call (~6k tokens); results are merged
+    UPLOAD_MAX_AGE_SECONDS = int(os.environ.get('UPLOAD_MAX_AGE_SECONDS') or 24 * 3600) # Unprocessed upload files older than this are expired
+    UPLOAD_ORPHAN_GRACE_SECONDS = int(os.environ.get('UPLOAD_ORPHAN_GRACE_SECONDS') or 3600) # Files without an upload row are removed after this
+    UPLOAD_DISK_QUOTA_BYTES = int(os.environ.get('UPLOAD_DISK_QUOTA_BYTES') or 1024 * 1024 * 1024) # Oldest files are evicted beyond this
+    UPLOAD_SWEEP_INTERVAL_SECONDS = int(os.environ.get('UPLOAD_SWEEP_INTERVAL_SECONDS') or 300) # Run by `flask worker`; 0 disables
+    UPLOAD_CLASSIFICATION_CACHE_ENABLED = (os.environ.get('UPLOAD_CLASSIFICATION_CACHE_ENABLED') or 'true').lower() == 'true' # Reuse skills of identical uploads
+    
+    # Classification cache for uploaded text (see app/classification_cache.py)
+    CLASSIFICATION_CACHE_ENABLED = (os.environ.get('CLASSIFICATION_CACHE_ENABLED') or 'true').lower() == 'true'
+    CLASSIFICATION_CACHE_MEMORY_SIZE = int(os.environ.get('CLASSIFICATION_CACHE_MEMORY_SIZE') or 1000) # In-process LRU entries
+    CLASSIFICATION_CACHE_TTL_SECONDS = int(os.environ.get('CLASSIFICATION_CACHE_TTL_SECONDS') or 30 * 24 * 3600)
+    CLASSIFICATION_CACHE_MAX_ENTRIES = int(os.environ.get('CLASSIFICATION_CACHE_MAX_ENTRIES') or 50000) # DB entries; least recently used are evicted beyond this
+    CLASSIFICATION_CACHE_EVICT_INTERVAL_SECONDS = int(os.environ.get('CLASSIFICATION_CACHE_EVICT_INTERVAL_SECONDS') or 3600) # Run by `flask worker`; 0 disables
+    
     # OpenAI Configuration
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
     OPENAI_MODEL = os.environ.get('OPENAI_MODEL') or 'gpt-4.1-mini'
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL') # Optional, e.g., a proxy or local stand-in server
+    OPENAI_TIMEOUT_SECONDS = float(os.environ.get('OPENAI_TIMEOUT_SECONDS') or 120) # Long enough for full video scripts
+    OPENAI_MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES') or 0) # SDK retries; app/rate_limit.py retries with Retry-After and jitter
+    OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS') or 20) # Shared HTTP pool per process
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS') or 10)
+    OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get('OPENAI_KEEPALIVE_EXPIRY_SECONDS') or 60)
+    
+    # OpenAI rate limiting (see app/rate_limit.py); limits apply per process
+    AI_REQUESTS_PER_MINUTE = int(os.environ.get('AI_REQUESTS_PER_MINUTE') or 500)
+    AI_TOKENS_PER_MINUTE = int(os.environ.get('AI_TOKENS_PER_MINUTE') or 200000)
+    AI_ADAPTIVE_MAX_CONCURRENCY = int(os.environ.get('AI_ADAPTIVE_MAX_CONCURRENCY') or 32) # Upper bound for the AIMD concurrency limit
+    AI_LATENCY_TARGET_SECONDS = float(os.environ.get('AI_LATENCY_TARGET_SECONDS') or 90) # Slower calls shrink the concurrency limit
+    AI_RETRY_MAX_ATTEMPTS = int(os.environ.get('AI_RETRY_MAX_ATTEMPTS') or 5)
+    AI_RETRY_BACKOFF_SECONDS = float(os.environ.get('AI_RETRY_BACKOFF_SECONDS') or 1)
+    AI_RETRY_BACKOFF_MAX_SECONDS = float(os.environ.get('AI_RETRY_BACKOFF_MAX_SECONDS') or 60)
+    
+    SINGLE_FLIGHT_ENABLED = (os.environ.get('SINGLE_FLIGHT_ENABLED') or 'true').lower() == 'true' # Share identical AI calls while they are in flight
+    SINGLE_FLIGHT_LEASE_SECONDS = int(os.environ.get('SINGLE_FLIGHT_LEASE_SECONDS') or 300) # Other processes take over a lease older than this
+    SINGLE_FLIGHT_POLL_INTERVAL_SECONDS = float(os.environ.get('SINGLE_FLIGHT_POLL_INTERVAL_SECONDS') or 0.5)
+    AI_MAX_CONCURRENCY = int(os.environ.get('AI_MAX_CONCURRENCY') or 4) # Parallel AI calls per fan-out (e.g., one per quiz skill)
+    
+    # API key lookup cache (see app/auth.py); set the TTL to 0 to disable
+    API_KEY_CACHE_SIZE = int(os.environ.get('API_KEY_CACHE_SIZE') or 10000)
+    API_KEY_CACHE_TTL_SECONDS = int(os.environ.get('API_KEY_CACHE_TTL_SECONDS') or 300) # Bounds how long a rotated key works in other processes
+    
+    # Background job queue (see app/jobs.py)
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS') or 3)
+    JOB_RETRY_BACKOFF_SECONDS = int(os.environ.get('JOB_RETRY_BACKOFF_SECONDS') or 30)
+    JOB_POLL_INTERVAL_SECONDS = float(os.environ.get('JOB_POLL_INTERVAL_SECONDS') or 2)
+    JOB_LOCK_TIMEOUT_SECONDS = int(os.environ.get('JOB_LOCK_TIMEOUT_SECONDS') or 900) # Running jobs older than this are requeued
+    
+    # Video worker (see app/video_worker.py)
+    VIDEO_WORKER_CONCURRENCY = int(os.environ.get('VIDEO_WORKER_CONCURRENCY') or 4) # Items generated in parallel per worker
+    VIDEO_WORKER_POLL_INTERVAL_SECONDS = float(os.environ.get('VIDEO_WORKER_POLL_INTERVAL_SECONDS') or 2)
+    VIDEO_GENERATION_TIMEOUT_SECONDS = int(os.environ.get('VIDEO_GENERATION_TIMEOUT_SECONDS') or 900) # Items 'generating' longer than this are requeued
+    
+    # Video script cache (see app/script_cache.py)
+    VIDEO_SCRIPT_VARIANTS = int(os.environ.get('VIDEO_SCRIPT_VARIANTS') or 3) # Distinct scripts kept per skill
+    VIDEO_SCRIPT_CACHE_TTL_SECONDS = int(os.environ.get('VIDEO_SCRIPT_CACHE_TTL_SECONDS') or 30 * 24 * 3600)
+    VIDEO_SCRIPT_CACHE_MAX_ENTRIES = int(os.environ.get('VIDEO_SCRIPT_CACHE_MAX_ENTRIES') or 5000) # Least recently used entries are evicted beyond this
+    
+    # Streaming video script generation (GET /api/videos/queue/<id>/stream)
+    VIDEO_SCRIPT_STREAMING = (os.environ.get('VIDEO_SCRIPT_STREAMING') or 'true').lower() == 'true' # Write scripts to disk as they are generated
+    VIDEO_STREAM_PROGRESS_INTERVAL_SECONDS = float(os.environ.get('VIDEO_STREAM_PROGRESS_INTERVAL_SECONDS') or 0.5) # How often the worker records progress
+    VIDEO_STREAM_POLL_INTERVAL_SECONDS = float(os.environ.get('VIDEO_STREAM_POLL_INTERVAL_SECONDS') or 0.2) # How often the SSE endpoint checks for new content
+    VIDEO_STREAM_MAX_POLL_INTERVAL_SECONDS = float(os.environ.get('VIDEO_STREAM_MAX_POLL_INTERVAL_SECONDS') or 2) # Polling backs off up to this while nothing changes
+    VIDEO_STREAM_MAX_SECONDS = float(os.environ.get('VIDEO_STREAM_MAX_SECONDS') or 30) # A stream holds a request thread at most this long, then asks the client to reconnect
+    VIDEO_STREAM_RETRY_MS = int(os.environ.get('VIDEO_STREAM_RETRY_MS') or 1000) # Reconnect delay sent to clients (SSE 'retry:')
+    VIDEO_STREAM_KEEPALIVE_SECONDS = float(os.environ.get('VIDEO_STREAM_KEEPALIVE_SECONDS') or 15)
+    
+    # Pre-generated question bank (see app/question_bank.py)
+    QUESTION_BANK_ENABLED = (os.environ.get('QUESTION_BANK_ENABLED') or 'true').lower() == 'true'
+    QUESTION_BANK_LOW_WATERMARK = int(os.environ.get('QUESTION_BANK_LOW_WATERMARK') or 5) # Refill a skill when fewer questions remain
+    QUESTION_BANK_TARGET_SIZE = int(os.environ.get('QUESTION_BANK_TARGET_SIZE') or 15) # Refill up to this many unserved questions
+    QUESTION_BANK_REFILL_BATCH = int(os.environ.get('QUESTION_BANK_REFILL_BATCH') or 5) # Questions requested per AI call
+    
+    # Metrics (see app/metrics.py), in Prometheus text format
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or 'true').lower() == 'true' # Time requests and serve GET /metrics
+    METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN') # Optional; scrapers then send 'Authorization: Bearer <token>'
+    METRICS_WORKER_PORT = int(os.environ.get('METRICS_WORKER_PORT') or 0) # Port for `flask worker` / `flask video-worker` metrics; 0 disables
+    
+    # Logging (see app/logs.py); records are written by a background thread
+    LOG_FORMAT = (os.environ.get('LOG_FORMAT') or 'json').lower() # 'json' (one object per line) or 'text'
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    LOG_LEVELS = os.environ.get('LOG_LEVELS') or '' # Per-module overrides, e.g. 'app.services=DEBUG,app.routes=WARNING'
+    LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES') or 'app.routes.answers=0.05,app.services.questions=0.1' # Share of high-volume INFO/DEBUG records kept
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE') or 10000) # Records beyond this are dropped (and counted) instead of blocking requests
+    LOG_FILE = os.environ.get('LOG_FILE') # Optional; defaults to stdout
     
     # Add other configurations like AI service keys, etc. 
\ No newline at end of file
@@ -1,3 +1,4 @@
+import click
 from app import create_app, db
 from app.models import User, Skill, PracticeTest # Import models needed for seeding
 
@@ -57,5 +58,64 @@ def seed_db():
         db.session.rollback()
         print(f"Error seeding database: {e}")
 
+def _start_worker_metrics(port):
+    port = port if port is not None else app.config['METRICS_WORKER_PORT']
+    if port and app.config['METRICS_ENABLED']:
+        from app.metrics import start_metrics_server
+        start_metrics_server(app, port)
+
+@app.cli.command('worker')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+@click.option('--poll-interval', type=float, default=None, help='Seconds to wait when the queue is empty.')
+@click.option('--metrics-port', type=int, default=None, help='Serve /metrics on this port (defaults to METRICS_WORKER_PORT).')
+def worker(burst, poll_interval, metrics_port):
+    """Runs background jobs (upload analysis and quiz generation)."""
+    from app.jobs import run_worker
+    _start_worker_metrics(metrics_port)
+    print("Starting job worker...")
+    try:
+        processed = run_worker(poll_interval=poll_interval, burst=burst)
+        print(f"Job worker finished: {processed} job(s) processed.")
+    except KeyboardInterrupt:
+        print("Job worker stopped.")
+
+@app.cli.command('video-worker')
+@click.option('--concurrency', type=int, default=None, help='Videos generated in parallel.')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+@click.option('--poll-interval', type=float, default=None, help='Seconds to wait when the queue is empty.')
+@click.option('--metrics-port', type=int, default=None, help='Serve /metrics on this port (defaults to METRICS_WORKER_PORT).')
+def video_worker(concurrency, burst, poll_interval, metrics_port):
+    """Generates and delivers queued video lessons."""
+    from app.video_worker import run_video_worker
+    _start_worker_metrics(metrics_port)
+    print("Starting video worker...")
+    try:
+        processed = run_video_worker(concurrency=concurrency, poll_interval=poll_interval, burst=burst)
+        print(f"Video worker finished: {processed} item(s) processed.")
+    except KeyboardInterrupt:
+        print("Video worker stopped.")
+
+@app.cli.command('refill-question-bank')
+def refill_question_bank_command():
+    """Queues question bank refills for skills below the low watermark."""
+    from app.question_bank import queue_low_skills
+    queued = queue_low_skills()
+    print(f"Queued question bank refill for {queued} skill(s). Run `flask worker` to process them.")
+
+@app.cli.command('sweep-uploads')
+def sweep_uploads_command():
+    """Removes upload files that are no longer needed (also run periodically by `flask worker`)."""
+    from app.uploads import sweep_uploads
+    removed = sweep_uploads()
+    print(f"Removed {removed} upload file(s).")
+
+@app.cli.command('clear-classification-cache')
+@click.option('--all', 'everything', is_flag=True, help='Remove every entry, not only superseded ones.')
+def clear_classification_cache_command(everything):
+    """Removes cached skill classifications (run after changing the prompt or model)."""
+    from app.classification_cache import invalidate_classification_cache
+    removed = invalidate_classification_cache(everything=everything)
+    print(f"Removed {removed} cached classification(s).")
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
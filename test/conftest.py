@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from config import Config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a migrated scratch SQLite database, inside an app context."""
+    from app import create_app, db
+    from flask_migrate import upgrade
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        DATABASE_REPLICA_URL = None
+        LOG_LEVEL = 'CRITICAL'
+        METRICS_ENABLED = False
+
+    app = create_app(TestConfig)
+    app.instance_path = str(tmp_path / 'instance')
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        yield app
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,90 @@
+"""Statement counts of the question read endpoints must not grow with the number of questions."""
+import json
+
+import pytest
+from sqlalchemy import event
+
+@pytest.fixture
+def student(app):
+    from app import db
+    from app.models import PracticeTest, StudentUpload, User
+
+    user = User(username='student')
+    user.generate_api_key()
+    practice_test = PracticeTest(identifier='Query Count Test')
+    upload = StudentUpload(student=user, practice_test=practice_test, processing_status='complete')
+    db.session.add_all([user, practice_test, upload])
+    db.session.commit()
+    return {"user_id": user.id, "api_key": user.api_key, "upload_id": upload.id} # Plain values: the session is reset between requests
+
+def add_quiz(student, question_count):
+    from app import db
+    from app.models import CustomQuiz, QuizQuestion, Skill
+
+    quiz = CustomQuiz(user_id=student["user_id"], student_upload_id=student["upload_id"])
+    db.session.add(quiz)
+    db.session.flush()
+    for i in range(question_count):
+        skill = Skill(name=f"Quiz {quiz.id} Skill {i + 1}", category="Math") # One skill per question: the worst case for per-question lookups
+        db.session.add(QuizQuestion(quiz=quiz, skill=skill, question_text=f"Question {i + 1}",
+                                    options_json=json.dumps({"A": "1", "B": "2"}), correct_option="A"))
+    db.session.commit()
+    return quiz.id
+
+def add_video_lesson(student, question_count):
+    from app import db
+    from app.models import PracticeQuestion, Skill, VideoLesson, VideoQueue
+
+    skill = Skill(name=f"Lesson Skill {question_count}", category="Math")
+    queue_item = VideoQueue(user_id=student["user_id"], skill=skill, status='delivered')
+    lesson = VideoLesson(skill=skill, queue_item=queue_item)
+    db.session.add_all([queue_item, lesson])
+    for i in range(question_count):
+        skill = Skill(name=f"Lesson {question_count} Skill {i + 1}", category="Math")
+        db.session.add(PracticeQuestion(video_lesson=lesson, skill=skill, question_text=f"Question {i + 1}",
+                                        options_json=json.dumps({"A": "1", "B": "2"}), correct_option="A"))
+    db.session.commit()
+    return lesson.id
+
+def count_statements(app, api_key, path):
+    """Issues GET path and returns (response, number of SQL statements it ran).
+
+    The path is requested once before counting, so the API key cache is warm
+    for every endpoint measured.
+    """
+    from app import db
+
+    statements = []
+
+    def on_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client = app.test_client()
+    client.get(path, headers={'X-API-Key': api_key})
+    db.session.remove() # Start from an empty identity map, like a fresh request
+    event.listen(db.engine, 'before_cursor_execute', on_statement)
+    try:
+        response = client.get(path, headers={'X-API-Key': api_key})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', on_statement)
+    return response, len(statements)
+
+def test_get_quiz_statement_count_is_constant(app, student):
+    counts = []
+    for question_count in (2, 25):
+        quiz_id = add_quiz(student, question_count)
+        response, statements = count_statements(app, student["api_key"], f'/api/quizzes/{quiz_id}')
+        assert response.status_code == 200
+        assert len(response.get_json()['questions']) == question_count
+        counts.append(statements)
+    assert counts[0] == counts[1]
+
+def test_get_practice_questions_statement_count_is_constant(app, student):
+    counts = []
+    for question_count in (2, 25):
+        video_id = add_video_lesson(student, question_count)
+        response, statements = count_statements(app, student["api_key"], f'/api/videos/{video_id}/practice')
+        assert response.status_code == 200
+        assert len(response.get_json()['questions']) == question_count
+        counts.append(statements)
+    assert counts[0] == counts[1]
@@ -0,0 +1,72 @@
+"""Questions claimed from the bank must go back to it when the quiz or practice set is not stored."""
+import pytest
+
+OPTIONS = {"A": "1", "B": "2", "C": "3", "D": "4"}
+
+@pytest.fixture
+def upload(app):
+    """A completed upload that missed two skills; only the first has a banked question."""
+    from app import db, ai_service
+    from app.models import BankedQuestion, MissedSkill, PracticeTest, Skill, StudentUpload, User
+
+    user = User(username='student')
+    banked_skill = Skill(name="Banked Skill", category="Math")
+    unbanked_skill = Skill(name="Unbanked Skill", category="Math")
+    upload = StudentUpload(student=user, practice_test=PracticeTest(identifier='Bank Test'), processing_status='complete')
+    question = BankedQuestion(skill=banked_skill, question_text="Banked question", correct_option="A",
+                              prompt_version=ai_service.QUIZ_QUESTION_PROMPT_VERSION, model=app.config['OPENAI_MODEL'])
+    question.options = OPTIONS
+    db.session.add_all([user, banked_skill, unbanked_skill, upload, question])
+    db.session.flush()
+    db.session.add_all([MissedSkill(user_id=user.id, student_upload_id=upload.id, skill_id=skill.id)
+                        for skill in (banked_skill, unbanked_skill)])
+    db.session.commit()
+    return upload.id
+
+def banked_question_state():
+    from app.models import BankedQuestion
+
+    question = BankedQuestion.query.one()
+    return question.served_at, question.claim_token
+
+def test_failed_quiz_generation_releases_claimed_questions(app, upload, monkeypatch):
+    from app import services
+    from app.models import CustomQuiz
+
+    def fail(skill_name, category):
+        raise RuntimeError("AI unavailable")
+
+    monkeypatch.setattr(services, 'generate_quiz_question', fail)
+    assert services.generate_custom_quiz(upload) is None
+    assert CustomQuiz.query.count() == 0
+    assert banked_question_state() == (None, None)
+
+def test_quiz_keeps_claimed_questions(app, upload, monkeypatch):
+    from app import services
+
+    monkeypatch.setattr(services, 'generate_quiz_question', lambda skill_name, category: {
+        "question_text": f"Generated question for {skill_name}", "options": OPTIONS, "correct_option": "A"
+    })
+    quiz = services.generate_custom_quiz(upload)
+    assert sorted(question.question_text for question in quiz.questions) == \
+        ["Banked question", "Generated question for Unbanked Skill"]
+    served_at, claim_token = banked_question_state()
+    assert served_at is not None and claim_token is not None
+
+def test_failed_practice_assignment_releases_claimed_questions(app, upload, monkeypatch):
+    from app import db, services
+    from app.models import PracticeQuestion, Skill, StudentUpload, VideoLesson, VideoQueue
+
+    def fail(skill_name, category, count, shared=True):
+        raise RuntimeError("AI unavailable")
+
+    skill = Skill.query.filter_by(name="Banked Skill").one()
+    queue_item = VideoQueue(user_id=db.session.get(StudentUpload, upload).user_id, skill=skill, status='delivered')
+    lesson = VideoLesson(skill=skill, queue_item=queue_item)
+    db.session.add_all([queue_item, lesson])
+    db.session.commit()
+
+    monkeypatch.setattr(services, 'generate_practice_questions', fail)
+    services.assign_practice_questions(lesson.id)
+    assert PracticeQuestion.query.count() == 0
+    assert banked_question_state() == (None, None)